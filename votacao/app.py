@@ -1,12 +1,23 @@
-from flask import Flask, render_template, request, redirect, url_for, flash  # Módulos do Flask para lidar com rotas e renderização de páginas
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify  # Módulos do Flask para lidar com rotas e renderização de páginas
 from blockchain.chain import Blockchain  # Importa a classe Blockchain definida no projeto
+from blockchain.block import transaction_id  # Identificador (comprovante) de uma transação
+from blockchain.producer import BlockProducer  # Mineração em lotes em segundo plano
+from blockchain.sequencer import Sequencer, WriterLock  # Escrita serializada em uma única thread
+from blockchain.mining import create_mining_engine  # Prova de trabalho em um ou vários processos
+from blockchain.signing import SigningService, LEGACY_ALGORITHM, default_key_path, load_or_create_key, public_key_pem  # Assinatura das transações e dos checkpoints
+from blockchain.merkle import verify_receipt  # Verificação de comprovantes de inclusão
+from blockchain.metrics import REGISTRY, CONTENT_TYPE, Gauge  # Métricas no formato do Prometheus
+from blockchain.ingest import BallotIngestor  # Importação em lote de cédulas coletadas offline
+from database import VoterDatabase  # Cadastro de eleitores e modelo de leitura dos votos (SQLite)
+import os  # Leitura de variáveis de ambiente
+import atexit  # Gravação do checkpoint ao encerrar
 import hashlib  # Para gerar hashes (usado para CPF e blocos)
+import hmac  # Comparação do token da importação em tempo constante
 import time  # Utilizado para marcações de tempo
+import queue  # Fila entre as threads que registram logs e a thread que os grava
 import logging  # Para geração de logs
-from logging.handlers import RotatingFileHandler  # Para salvar logs com limite de tamanho
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener  # Logs com limite de tamanho e gravação em segundo plano
 from datetime import datetime  # Manipulação de datas
-from cryptography.hazmat.primitives import hashes  # Hashes para assinatura digital
-from cryptography.hazmat.primitives.asymmetric import padding, rsa  # Algoritmos assimétricos (RSA) e preenchimento para assinaturas
 
 
 # CONFIGURAÇÃO DO SISTEMA DE LOGS
@@ -15,6 +26,8 @@ from cryptography.hazmat.primitives.asymmetric import padding, rsa  # Algoritmos
 def setup_logging():
     log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'  # Define o formato do log
     formatter = logging.Formatter(log_format)
+    # Nível configurável por ambiente (LOG_LEVEL=DEBUG em desenvolvimento)
+    level = getattr(logging, os.environ.get('LOG_LEVEL', 'INFO').upper(), logging.INFO)
     
     # Log rotativo para salvar até 5 arquivos de 1MB
     file_handler = RotatingFileHandler(
@@ -29,16 +42,22 @@ def setup_logging():
     # Log também no console (terminal)
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.DEBUG)
+    console_handler.setLevel(level)
 
-    # Aplica handlers ao logger principal
+    # As threads das requisições apenas enfileiram os registros; a formatação e a escrita em
+    # arquivo e console acontecem na thread do QueueListener. A thread só é iniciada depois da
+    # criação do pool de mineração: até lá os registros aguardam na fila.
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+
+    # Aplica o handler da fila ao logger principal
     root_logger = logging.getLogger()
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
-    root_logger.setLevel(logging.DEBUG)
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(level)
+    return listener
 
 # Chamada para configurar logs ao iniciar o script
-setup_logging()
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)  # Criação do logger local
 
 
@@ -62,26 +81,85 @@ def datetimeformat(value, format='%d/%m/%Y %H:%M:%S'):
 # INICIALIZAÇÃO DA BLOCKCHAIN E CRIPTOGRAFIA
 
 
-blockchain = Blockchain()  # Instancia uma nova blockchain
-
-# Gera um par de chaves RSA para assinatura digital
-private_key = rsa.generate_private_key(
-    public_exponent=65537,
-    key_size=2048
+# Serviço de assinatura: algoritmo em SIGNING_ALGORITHM ('rsa-pss-sha256' ou 'ed25519'), chave
+# gerada e gravada apenas na primeira execução, assinatura em lote em SIGNING_WORKERS threads
+signing_algorithm = os.environ.get('SIGNING_ALGORITHM', LEGACY_ALGORITHM)
+signing = SigningService(
+    load_or_create_key(signing_algorithm, os.environ.get('SIGNING_KEY_FILE', default_key_path(signing_algorithm))),
+    workers=int(os.environ.get('SIGNING_WORKERS', 4))
 )
-public_key = private_key.public_key()
-
-# Função para assinar transações com a chave privada
-def sign_transaction(data: str) -> bytes:
-    return private_key.sign(
-        data.encode(),
-        padding.PSS(
-            mgf=padding.MGF1(hashes.SHA256()),
-            salt_length=padding.PSS.MAX_LENGTH
-        ),
-        hashes.SHA256()
+
+# Apenas um processo pode abrir a cadeia para escrita (vários workers criariam cadeias divergentes)
+writer_lock = WriterLock(os.path.join(Blockchain.data_dir, 'writer.lock'))
+writer_lock.acquire()
+
+# Instancia a blockchain (as transações são assinadas na mineração e o checkpoint de inicialização
+# com a mesma chave da aplicação)
+blockchain = Blockchain(checkpoint_signer=signing, signer=signing)
+
+# Até aqui nenhuma thread foi iniciada: os processos da auditoria e da mineração são criados (fork)
+# antes das threads da aplicação. Os registros de log aguardam na fila até o início do QueueListener.
+
+# Auditoria completa opcional na inicialização (AUDIT_ON_STARTUP=1)
+if os.environ.get('AUDIT_ON_STARTUP') == '1':
+    blockchain.audit(
+        processes=int(os.environ.get('AUDIT_PROCESSES', 0)) or None,
+        public_keys={signing.name: public_key_pem(signing.algorithm)}
+        if os.environ.get('AUDIT_SIGNATURES') == '1' else None
     )
 
+# Mecanismo de mineração: MINING_PROCESSES > 1 distribui a prova de trabalho entre processos (o pool
+# também inicia threads próprias, por isso é criado depois da auditoria)
+blockchain.mining_engine = create_mining_engine(int(os.environ.get('MINING_PROCESSES', 1)))
+
+# Os processos já foram criados, então as threads da aplicação podem ser iniciadas, a começar pela
+# dos logs (a fila é esvaziada por último ao encerrar)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+# Banco de dados do cadastro de eleitores e dos votos confirmados, alimentado a cada novo bloco
+database = VoterDatabase(os.environ.get('DATABASE_URL', 'sqlite:///voting_system.db'))
+database.attach(blockchain)
+
+# Com REQUIRE_REGISTRATION=1 apenas eleitores cadastrados podem votar
+REQUIRE_REGISTRATION = os.environ.get('REQUIRE_REGISTRATION') == '1'
+
+# Sequenciador: todas as alterações da cadeia são executadas por uma única thread escritora
+sequencer = Sequencer(blockchain)
+sequencer.start()
+
+# Produtor de blocos: agrupa os votos pendentes em blocos, fora das requisições HTTP
+producer = BlockProducer(
+    blockchain,
+    max_transactions=int(os.environ.get('BLOCK_MAX_TRANSACTIONS', 100)),
+    max_wait=float(os.environ.get('BLOCK_MAX_WAIT', 2.0)),
+    sequencer=sequencer
+)
+producer.start()
+
+# Ao encerrar: mineração das transações pendentes e gravação do checkpoint
+@atexit.register
+def shutdown():
+    producer.stop()
+    sequencer.stop()
+    blockchain.close()
+    signing.close()
+    database.close()
+    writer_lock.release()
+
+# Medidores calculados a cada leitura de /metrics
+Gauge('blockchain_height', 'Quantidade de blocos na cadeia').set_function(lambda: len(blockchain.chain))
+Gauge('blockchain_mempool_size', 'Transações pendentes na pool').set_function(
+    lambda: len(blockchain.unconfirmed_transactions))
+Gauge('blockchain_votes_total', 'Votos confirmados na apuração').set_function(lambda: blockchain.tally.total)
+
+# Candidatos disponíveis na votação
+CANDIDATES = {
+    1: {'name': 'Marcela', 'party': 'Chapa 1'},
+    2: {'name': 'Fábio', 'party': 'Chapa 2'},
+    3: {'name': 'Oswaldo', 'party': 'Chapa 3'}
+}
+
 
 # ROTAS FLASK
 
@@ -97,7 +175,7 @@ def verify():
     try:
         # Limpa a string do CPF (remove . e -)
         cpf = request.form['cpf'].replace('.', '').replace('-', '')
-        logger.debug(f"Verificação iniciada para CPF: {cpf[:3]}***")
+        logger.debug("Verificação iniciada para CPF: %s***", cpf[:3])
         
         # Validação do formato do CPF
         if len(cpf) != 11 or not cpf.isdigit():
@@ -108,16 +186,23 @@ def verify():
         # Gera um hash do CPF para anonimato
         cpf_hash = hashlib.sha256(cpf.encode()).hexdigest()
         
-        # Verifica se esse CPF já votou
-        for block in blockchain.chain:
-            for tx in block.transactions:
-                if tx.get('cpf_hash') == cpf_hash and tx.get('type') == 'vote':
-                    logger.warning(f"Tentativa de voto duplicado: {cpf_hash[:6]}...")
-                    flash('Este CPF já votou!', 'error')
-                    return redirect(url_for('index'))
+        # Verifica se esse CPF já votou (consulta ao índice de eleitores)
+        if blockchain.has_voted(cpf_hash):
+            logger.warning(f"Tentativa de voto duplicado: {cpf_hash[:6]}...")
+            flash('Este CPF já votou!', 'error')
+            return redirect(url_for('index'))
+
+        # Consulta o cadastro de eleitores (obrigatório apenas com REQUIRE_REGISTRATION=1)
+        registered = database.get_voter(cpf_hash)
+        if REQUIRE_REGISTRATION and registered is None:
+            logger.warning(f"CPF não cadastrado: {cpf_hash[:6]}...")
+            flash('CPF não cadastrado. Faça o cadastro para votar.', 'error')
+            # O formulário de cadastro é exibido nesta resposta, já preenchido: o CPF não vai para a
+            # URL de um redirecionamento (e, com ela, para o log de acesso)
+            return render_template('register.html', cpf=cpf)
 
         logger.info(f"CPF válido: {cpf_hash[:6]}...")
-        voter = {'cpf': cpf, 'name': 'Eleitor'}  # Dados fictícios do eleitor
+        voter = {'cpf': cpf, 'name': registered['name'] if registered else 'Eleitor'}
         return render_template('vote.html', voter=voter)
         
     except Exception as e:
@@ -125,6 +210,40 @@ def verify():
         flash('Erro no processo de verificação', 'error')
         return redirect(url_for('index'))
 
+# Cadastro de eleitores
+@app.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'GET':
+        return render_template('register.html', cpf='')
+    try:
+        cpf = request.form['cpf'].replace('.', '').replace('-', '')
+        name = request.form['name'].strip()
+
+        # Validação do formato do CPF e do nome
+        if len(cpf) != 11 or not cpf.isdigit():
+            logger.warning("CPF inválido submetido no cadastro")
+            flash('CPF inválido. Deve conter 11 dígitos.', 'error')
+            return render_template('register.html', cpf=request.form['cpf'])
+        if not name:
+            flash('Informe o nome completo.', 'error')
+            return render_template('register.html', cpf=request.form['cpf'])
+
+        # Apenas o hash do CPF é armazenado
+        cpf_hash = hashlib.sha256(cpf.encode()).hexdigest()
+        if not database.register_voter(cpf_hash, name[:100]):
+            logger.warning(f"Cadastro duplicado: {cpf_hash[:6]}...")
+            flash('Este CPF já está cadastrado!', 'error')
+            return redirect(url_for('index'))
+
+        logger.info(f"Eleitor cadastrado: {cpf_hash[:6]}...")
+        flash('Cadastro realizado! Você já pode votar.', 'success')
+        return redirect(url_for('index'))
+
+    except Exception as e:
+        logger.error(f"Erro no cadastro: {str(e)}", exc_info=True)
+        flash('Erro ao realizar cadastro', 'error')
+        return redirect(url_for('index'))
+
 # Registro do voto
 @app.route('/vote', methods=['POST'])
 def vote():
@@ -134,7 +253,18 @@ def vote():
         candidate_id = int(request.form['candidate'])  # ID do candidato selecionado
         cpf_hash = hashlib.sha256(cpf.encode()).hexdigest()
 
-        logger.debug(f"Dados do voto - CPF Hash: {cpf_hash[:6]}..., Candidato: {candidate_id}")
+        logger.debug("Dados do voto - CPF Hash: %s..., Candidato: %s", cpf_hash[:6], candidate_id)
+
+        # Impede voto duplicado mesmo que a etapa de verificação seja contornada
+        if blockchain.has_voted(cpf_hash):
+            logger.warning(f"Tentativa de voto duplicado: {cpf_hash[:6]}...")
+            flash('Este CPF já votou!', 'error')
+            return redirect(url_for('index'))
+
+        if REQUIRE_REGISTRATION and not database.is_registered(cpf_hash):
+            logger.warning(f"Voto de CPF não cadastrado: {cpf_hash[:6]}...")
+            flash('CPF não cadastrado. Faça o cadastro para votar.', 'error')
+            return redirect(url_for('register'))
         
         # Cria a transação de voto
         transaction = {
@@ -144,21 +274,19 @@ def vote():
             'timestamp': time.time()
         }
 
-        # Assina digitalmente a transação
-        transaction['signature'] = sign_transaction(str(transaction)).hex()
-        logger.debug("Transação assinada com sucesso")
+        # Marca o algoritmo de assinatura; a assinatura é feita em lote pelo produtor de blocos
+        signing.prepare(transaction)
+        receipt = transaction_id(transaction)  # Calculado antes de a transação ser compartilhada
 
-        # Adiciona a transação à blockchain
-        blockchain.add_new_transaction(transaction)
+        # Adiciona a transação à pool (gravada no write-ahead log antes de retornar)
+        if not sequencer.add_transaction(transaction):
+            flash('Erro ao registrar voto', 'error')
+            return redirect(url_for('index'))
         logger.info("Transação adicionada à pool não confirmada")
 
-        # Minera um novo bloco
-        start_time = time.time()
-        block_index = blockchain.mine()
-        mining_time = time.time() - start_time
-
-        logger.info(f"Bloco #{block_index} minerado em {mining_time:.2f}s")
-        flash('Voto registrado na blockchain!', 'success')
+        # A mineração acontece em lote no produtor de blocos
+        producer.notify()
+        flash(f'Voto registrado! Comprovante: {receipt}', 'success')
         return redirect(url_for('index'))
 
     except Exception as e:
@@ -171,64 +299,166 @@ def vote():
 def results():
     try:
         logger.info("Gerando resultados")
-        votes = {}  # Armazena contagem de votos
-        candidates = {
-            1: {'name': 'Marcela', 'party': 'Chapa 1'},
-            2: {'name': 'Fábio', 'party': 'Chapa 2'},
-            3: {'name': 'Oswaldo', 'party': 'Chapa 3'}
-        }
-
-        # Conta votos por candidato
-        for block in blockchain.chain:
-            for tx in block.transactions:
-                if tx.get('type') == 'vote':
-                    candidate_id = tx['candidate_id']
-                    votes[candidate_id] = votes.get(candidate_id, 0) + 1
+        tally = blockchain.tally  # Apuração mantida incrementalmente pela blockchain
 
         # Prepara os dados para exibição
         results = []
-        for candidate_id, data in candidates.items():
+        for candidate_id, data in CANDIDATES.items():
             results.append({
                 'name': data['name'],
                 'party': data['party'],
-                'votes': votes.get(candidate_id, 0)
+                'votes': tally.votes_for(candidate_id)
             })
 
-        logger.debug(f"Resultados calculados: {results}")
-        return render_template('results.html', candidates=results)
+        logger.debug("Resultados calculados: %s", results)
+        return render_template('results.html', candidates=results, tally=tally)
 
     except Exception as e:
         logger.error(f"Erro ao gerar resultados: {str(e)}", exc_info=True)
         flash('Erro ao obter resultados', 'error')
         return redirect(url_for('index'))
 
-# Exibição da blockchain completa
+# Apuração em JSON, com checksum vinculado ao bloco de topo e detalhamento opcional por janela de tempo
+@app.route('/api/results')
+def api_results():
+    include_buckets = request.args.get('buckets') == '1'
+    if request.args.get('source') == 'database':
+        data = database.to_dict()  # Apuração consultada no modelo de leitura (SQLite)
+    else:
+        data = blockchain.tally.to_dict(include_buckets=include_buckets)
+    data['candidates'] = {str(candidate_id): info for candidate_id, info in CANDIDATES.items()}
+    return jsonify(data)
+
+# Situação de um voto a partir do comprovante (pendente ou confirmado em um bloco)
+@app.route('/api/ballots/<tx_id>')
+def ballot_status(tx_id):
+    status = blockchain.transaction_status(tx_id)
+    if status is None:
+        return jsonify({'status': 'unknown'}), 404
+    return jsonify(status)
+
+# Estatísticas do mecanismo de mineração (taxa de hashes, tentativas, tempo)
+@app.route('/api/mining')
+def mining_stats():
+    data = blockchain.mining_engine.to_dict()
+    data['difficulty'] = blockchain.difficulty
+    return jsonify(data)
+
+# Comprovante de inclusão (caminho de Merkle) de um voto, pelo comprovante (transaction_id) ou cpf_hash
+@app.route('/api/receipts/<ref>')
+def receipt(ref):
+    proof = blockchain.inclusion_proof(ref)
+    if proof is None:
+        return jsonify({'error': 'voto não confirmado em um bloco com raiz de Merkle'}), 404
+    return jsonify(proof)
+
+# Verifica um comprovante de inclusão sem consultar a cadeia
+@app.route('/api/receipts/verify', methods=['POST'])
+def verify_receipt_route():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'comprovante deve ser um objeto JSON'}), 400
+    return jsonify({'valid': verify_receipt(data, blockchain.difficulty)})
+
+# Blocos são imutáveis: respostas que dependem apenas de blocos já gravados podem ficar em cache
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+BLOCKS_PAGE_SIZE = 10  # Blocos por página na visualização HTML
+API_MAX_LIMIT = 100  # Máximo de blocos por página na API
+
+# Lista paginada de blocos em ordem crescente a partir de um cursor (índice do primeiro bloco)
+@app.route('/api/blocks')
+def api_blocks():
+    try:
+        cursor = max(int(request.args.get('cursor', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 20)), 1), API_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'cursor e limit devem ser inteiros'}), 400
+
+    height = len(blockchain.chain)
+    blocks = blockchain.chain[cursor:cursor + limit]
+    page = {
+        'blocks': [block.to_dict() for block in blocks],
+        'cursor': cursor,
+        'limit': limit
+    }
+    if len(blocks) == limit:
+        # Página completa: seu conteúdo nunca mais muda, por isso não traz a altura atual da cadeia.
+        # O próximo cursor é sempre o bloco seguinte; ao alcançar o fim, a página seguinte vem
+        # incompleta ou vazia.
+        page['next_cursor'] = cursor + limit
+        response = jsonify(page)
+        response.set_etag(f"{cursor}-{limit}-{blocks[-1].hash}")
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    else:
+        # Página final incompleta: pode ganhar blocos, então o cliente deve revalidar. A altura faz
+        # parte da ETag, pois também está no corpo.
+        page['next_cursor'] = None
+        page['height'] = height
+        response = jsonify(page)
+        last_hash = blocks[-1].hash if blocks else 'empty'
+        response.set_etag(f"{cursor}-{limit}-{height}-{last_hash}")
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# Um bloco pelo índice ou pelo hash
+@app.route('/api/blocks/<ref>')
+def api_block(ref):
+    block = blockchain.get_block(ref)
+    if block is None:
+        return jsonify({'error': 'bloco não encontrado'}), 404
+    response = jsonify(block.to_dict())
+    response.set_etag(block.hash)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    return response.make_conditional(request)
+
+# Exibição paginada da blockchain (blocos mais recentes primeiro)
 @app.route('/blocks')
 def show_blocks():
     try:
         logger.info("Solicitação de visualização da blockchain")
-        blocks_data = []
-
-        # Coleta dados de cada bloco
-        for block in blockchain.chain:
-            blocks_data.append({
-                'index': block.index,
-                'transactions': block.transactions,
-                'timestamp': block.timestamp,
-                'hash': block.hash,
-                'previous_hash': block.previous_hash,
-                'nonce': block.nonce
-            })
+        height = len(blockchain.chain)
+        pages = max((height + BLOCKS_PAGE_SIZE - 1) // BLOCKS_PAGE_SIZE, 1)
+        page = min(max(request.args.get('page', 1, type=int), 1), pages)
+
+        # Coleta apenas os blocos da página solicitada
+        end = height - (page - 1) * BLOCKS_PAGE_SIZE
+        start = max(end - BLOCKS_PAGE_SIZE, 0)
+        blocks_data = [block.to_dict() for block in reversed(blockchain.chain[start:end])]
 
-        logger.debug(f"Blocos recuperados: {len(blocks_data)}")
-        return render_template('blocks.html', blocks=blocks_data)
+        logger.debug("Blocos recuperados: %d", len(blocks_data))
+        return render_template('blocks.html', blocks=blocks_data, page=page, pages=pages, height=height)
 
     except Exception as e:
         logger.error(f"Erro ao recuperar blocos: {str(e)}", exc_info=True)
         flash('Erro ao carregar blockchain', 'error')
         return redirect(url_for('index'))
 
+# Importação em lote de cédulas offline (JSON lines no corpo da requisição). Só fica disponível com
+# INGEST_TOKEN definido, enviado como "Authorization: Bearer <token>".
+INGEST_TOKEN = os.environ.get('INGEST_TOKEN')
+
+@app.route('/api/ingest', methods=['POST'])
+def ingest():
+    authorization = request.headers.get('Authorization', '')
+    if not INGEST_TOKEN or not hmac.compare_digest(authorization, f'Bearer {INGEST_TOKEN}'):
+        return jsonify({'error': 'não autorizado'}), 403
+    try:
+        ingestor = BallotIngestor(blockchain, sequencer, signing, CANDIDATES, producer=producer)
+        # O corpo é lido linha a linha, sem carregar o arquivo inteiro em memória
+        report = ingestor.run(request.stream)
+        return jsonify(report.to_dict())
+    except Exception as e:
+        logger.error(f"Erro na importação em lote: {str(e)}", exc_info=True)
+        return jsonify({'error': 'erro na importação'}), 500
+
+# Métricas no formato de texto do Prometheus
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
 # Inicializa o servidor Flask
 if __name__ == '__main__':
     logger.info("Iniciando servidor Flask")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Sem o reloader do Werkzeug: ele executaria este módulo em um segundo processo, que não
+    # conseguiria obter a trava de escrita da cadeia já detida pelo primeiro
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
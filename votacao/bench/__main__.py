@@ -0,0 +1,100 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from .endpoints import measure_endpoints
+from .persistence import measure_persistence
+from .pow import measure_pow
+from .synthetic import build_chain
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+
+def _isolated(function, *args):
+    # Cada medição roda em um processo novo, para que a memória e o estado da aplicação de uma
+    # medição não interfiram na seguinte
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(function, *args).result()
+
+
+def _metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def _sizes(value):
+    # Aceita inteiros ou notação científica (ex.: 1e3,1e4,1e6)
+    return [int(float(size)) for size in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do sistema de votação')
+    parser.add_argument('--sizes', type=_sizes, default=[1000, 10000, 100000],
+                        help='Quantidades de votos das cadeias sintéticas (ex.: 1e3,1e4,1e5,1e6)')
+    parser.add_argument('--block-size', type=int, default=1000, help='Votos por bloco nas cadeias sintéticas')
+    parser.add_argument('--requests', type=int, default=200, help='Requisições por rota')
+    parser.add_argument('--difficulties', type=_sizes, default=[1, 2, 3, 4])
+    parser.add_argument('--pow-samples', type=int, default=20)
+    parser.add_argument('--json-limit', type=int, default=100000,
+                        help='Maior cadeia em que o armazenamento JSON legado também é medido')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'votacao-bench'),
+                        help='Diretório das cadeias sintéticas (reaproveitadas entre execuções)')
+    parser.add_argument('--skip', action='append', default=[], choices=['pow', 'endpoints', 'persistence'])
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report = {'meta': _metadata(), 'config': {
+        'sizes': args.sizes, 'block_size': args.block_size, 'requests': args.requests
+    }}
+
+    if 'pow' not in args.skip:
+        logger.info("Medindo proof_of_work por dificuldade")
+        report['pow'] = _isolated(measure_pow, args.difficulties, args.pow_samples)
+
+    report['sizes'] = []
+    for votes in args.sizes:
+        # A cadeia de cada medição de rotas é uma cópia, pois os votos enviados a alteram
+        base = os.path.join(args.workdir, f'chain-{votes}')
+        entry = {'votes': votes, 'chain': build_chain(base, votes, args.block_size)}
+        if 'persistence' not in args.skip:
+            logger.info(f"Medindo persistência com {votes} votos")
+            entry['persistence'] = _isolated(measure_persistence, base, votes <= args.json_limit)
+        if 'endpoints' not in args.skip:
+            logger.info(f"Medindo rotas com {votes} votos")
+            scratch = tempfile.mkdtemp(prefix=f'bench-app-{votes}-')
+            shutil.copytree(base, scratch, dirs_exist_ok=True)
+            try:
+                entry['endpoints'] = _isolated(measure_endpoints, scratch, votes, args.requests)
+            finally:
+                shutil.rmtree(scratch, ignore_errors=True)
+        report['sizes'].append(entry)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    logger.info(f"Resultados gravados em {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    # Uso (a partir do diretório votacao): python -m bench --sizes 1e3,1e4,1e5 --output bench_results.json
+    main()
@@ -0,0 +1,61 @@
+import os
+import time
+import logging
+from .stats import summarize, timed
+from .synthetic import cpf_for
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+
+def _run(client, method, paths, data=None):
+    # Executa uma requisição por caminho (ou por item de `data`) e retorna o resumo das latências
+    samples = []
+    statuses = {}
+    start_time = time.perf_counter()
+    for i, path in enumerate(paths):
+        response, seconds = timed(getattr(client, method), path, data=data[i] if data else None)
+        samples.append(seconds)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    result = summarize(samples, time.perf_counter() - start_time)
+    result['status'] = {str(code): count for code, count in sorted(statuses.items())}
+    return result
+
+
+def measure_endpoints(workdir, votes, requests=200, log=False):
+    # Executado em um processo próprio: importa a aplicação sobre a cadeia de `workdir` e mede cada
+    # rota com o cliente de teste do Flask
+    os.chdir(workdir)
+    os.environ.setdefault('BLOCK_MAX_WAIT', '0.5')
+    if not log:
+        logging.disable(logging.WARNING)  # Sem custo de gravação de log nas medições
+
+    _, startup_seconds = timed(__import__, 'app')
+    import app as application
+    client = application.app.test_client()
+    height = len(application.blockchain.chain)
+
+    # Eleitores novos (após os votos sintéticos) e eleitores que já votaram
+    new_voters = [cpf_for(votes + i) for i in range(requests)]
+    old_voters = [cpf_for(i * max(votes // requests, 1) % max(votes, 1)) for i in range(requests)]
+    last_page = max((height + application.BLOCKS_PAGE_SIZE - 1) // application.BLOCKS_PAGE_SIZE, 1)
+
+    results = {
+        'startup_seconds': round(startup_seconds, 3),
+        'verify_new': _run(client, 'post', ['/verify'] * requests, [{'cpf': cpf} for cpf in new_voters]),
+        'verify_voted': _run(client, 'post', ['/verify'] * requests, [{'cpf': cpf} for cpf in old_voters]),
+        'vote': _run(client, 'post', ['/vote'] * requests,
+                     [{'cpf': cpf, 'candidate': str(i % 3 + 1)} for i, cpf in enumerate(new_voters)]),
+        'results': _run(client, 'get', ['/results'] * requests),
+        'api_results': _run(client, 'get', ['/api/results'] * requests),
+        'blocks_first_page': _run(client, 'get', ['/blocks'] * requests),
+        'blocks_last_page': _run(client, 'get', [f'/blocks?page={last_page}'] * requests),
+        'api_blocks': _run(client, 'get', [f'/api/blocks?cursor={i % height}&limit=10' for i in range(requests)]),
+    }
+
+    # Tempo até os votos enviados serem incluídos em blocos
+    _, drain_seconds = timed(application.producer.stop)
+    results['vote_drain_seconds'] = round(drain_seconds, 3)
+    application.shutdown()
+    return results
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import tracemalloc
+import logging
+from blockchain.chain import Blockchain
+from blockchain.storage import JsonFileStorage
+from .stats import timed
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+
+# Variações da Blockchain medidas: leitura sob demanda, leitura completa e reconstrução sem checkpoint
+class EagerBlockchain(Blockchain):
+    lazy_loading = False
+
+
+class RebuildBlockchain(Blockchain):
+    checkpoint_file = None
+
+
+def _load(cls):
+    # Carrega a cadeia sem gravar checkpoint ao final (apenas fecha o armazenamento)
+    blockchain, seconds = timed(cls)
+    blockchain.storage.close()
+    return blockchain, seconds
+
+
+def _memory(cls):
+    # Memória alocada pela carga da cadeia (atual após a carga e pico durante a carga)
+    tracemalloc.start()
+    blockchain = cls()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blockchain.storage.close()
+    return {'current_mb': round(current / 2 ** 20, 2), 'peak_mb': round(peak / 2 ** 20, 2)}
+
+
+def measure_persistence(workdir, json_storage=True):
+    # Executado em um processo próprio: tempos de load_chain/save_chain e memória sobre a cadeia de `workdir`
+    os.chdir(workdir)
+    logging.disable(logging.WARNING)
+    results = {}
+    for name, cls in (('lazy', Blockchain), ('eager', EagerBlockchain), ('rebuild', RebuildBlockchain)):
+        _, seconds = _load(cls)
+        results[f'load_{name}_seconds'] = round(seconds, 3)
+        results[f'memory_{name}'] = _memory(cls)
+
+    # save_chain regrava toda a cadeia; é medido sobre uma cópia para preservar a cadeia sintética
+    scratch = tempfile.mkdtemp(prefix='bench-save-')
+    try:
+        shutil.copytree(Blockchain.data_dir, os.path.join(scratch, Blockchain.data_dir))
+        os.chdir(scratch)
+        blockchain, _ = _load(EagerBlockchain)
+        _, seconds = timed(blockchain.save_chain)
+        results['save_chain_seconds'] = round(seconds, 3)
+        blockchain.storage.close()
+
+        if json_storage:
+            # Armazenamento legado (arquivo JSON único) com os mesmos blocos, para comparação
+            blocks = [block.to_dict() for block in blockchain.chain]
+            storage = JsonFileStorage(os.path.join(scratch, 'blockchain_data.json'))
+            _, seconds = timed(storage.save, blocks, [])
+            results['json_save_seconds'] = round(seconds, 3)
+            _, seconds = timed(JsonFileStorage(storage.path).load)
+            results['json_load_seconds'] = round(seconds, 3)
+            results['json_file_mb'] = round(os.path.getsize(storage.path) / 2 ** 20, 2)
+    finally:
+        os.chdir(workdir)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    data_bytes = sum(os.path.getsize(os.path.join(Blockchain.data_dir, name))
+                     for name in os.listdir(Blockchain.data_dir))
+    results['segmented_mb'] = round(data_bytes / 2 ** 20, 2)
+    return results
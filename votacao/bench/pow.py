@@ -0,0 +1,37 @@
+import os
+import tempfile
+import logging
+from blockchain.block import Block
+from blockchain.chain import Blockchain
+from blockchain.storage import JsonFileStorage
+from .stats import summarize, timed, working_directory
+from .synthetic import BASE_TIMESTAMP, synthetic_vote
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+
+def measure_pow(difficulties=(1, 2, 3, 4), samples=20, block_size=100):
+    # Custo de proof_of_work por dificuldade: tempo e tentativas para minerar blocos de `block_size` votos
+    workdir = tempfile.mkdtemp(prefix='bench-pow-')
+    results = {}
+    with working_directory(workdir):
+        blockchain = Blockchain(storage=JsonFileStorage(os.path.join(workdir, 'chain.json')))
+        transactions = [synthetic_vote(voter) for voter in range(block_size)]
+        for difficulty in difficulties:
+            blockchain.difficulty = difficulty
+            times = []
+            attempts = []
+            for sample in range(samples):
+                # Timestamps distintos mudam o cabeçalho e, com ele, o nonce a ser encontrado
+                block = Block(1, transactions, BASE_TIMESTAMP + sample, blockchain.last_block.hash)
+                _, seconds = timed(blockchain.proof_of_work, block)
+                times.append(seconds)
+                attempts.append(blockchain.mining_engine.stats.last_attempts)
+            result = summarize(times)
+            result['mean_attempts'] = round(sum(attempts) / len(attempts), 1)
+            result['hashrate'] = round(sum(attempts) / sum(times), 1) if sum(times) else 0.0
+            results[str(difficulty)] = result
+            logger.info(f"Dificuldade {difficulty}: p50 {result['p50_ms']}ms, {result['mean_attempts']} tentativas")
+    return results
@@ -0,0 +1,45 @@
+import contextlib
+import os
+import time
+
+
+def percentile(sorted_samples, q):
+    # Percentil por interpolação linear (amostras já ordenadas)
+    if not sorted_samples:
+        return 0.0
+    position = (len(sorted_samples) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (position - lower)
+
+
+def summarize(samples, elapsed=None):
+    # Resumo de latências (em segundos) em milissegundos, com vazão em operações por segundo
+    ordered = sorted(samples)
+    total = elapsed if elapsed is not None else sum(ordered)
+    return {
+        'count': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        'per_second': round(len(ordered) / total, 1) if total else 0.0
+    }
+
+
+def timed(function, *args, **kwargs):
+    # Executa a função e retorna (resultado, segundos)
+    start_time = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start_time
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    # A aplicação e a Blockchain usam caminhos relativos ao diretório atual
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
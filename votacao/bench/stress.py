@@ -0,0 +1,162 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import logging
+from blockchain.chain import Blockchain
+from blockchain.producer import BlockProducer
+from blockchain.sequencer import Sequencer, WriterLock
+from blockchain.signing import ALGORITHMS, LEGACY_ALGORITHM, SigningService, public_key_pem
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+
+def _try_lock(path, result):
+    # Executado em outro processo: a trava de escrita deve ser recusada enquanto o servidor a detém
+    try:
+        WriterLock(path).acquire()
+        result.value = 1
+    except RuntimeError:
+        result.value = 0
+
+
+def make_vote(voter, candidates):
+    return {
+        'type': 'vote',
+        'cpf_hash': hashlib.sha256(f'{voter:011d}'.encode()).hexdigest(),
+        'candidate_id': random.randint(1, candidates),
+        'timestamp': time.time()
+    }
+
+
+def run(args):
+    # Teste de carga do sequenciador: vários threads enviam votos (parte deles duplicados) enquanto o
+    # produtor minera e leitores consultam a cadeia; ao final nenhum voto pode ter sido perdido ou duplicado
+    Blockchain.difficulty = args.difficulty
+    workdir = tempfile.mkdtemp(prefix='stress-')
+    os.chdir(workdir)
+
+    lock = WriterLock(os.path.join(Blockchain.data_dir, 'writer.lock'))
+    lock.acquire()
+    # Mesma configuração do servidor: as transações são assinadas em lote antes da prova de trabalho
+    algorithm = ALGORITHMS[args.algorithm]
+    signing = SigningService(algorithm(algorithm.generate()))
+    blockchain = Blockchain(checkpoint_signer=signing, signer=signing)
+    sequencer = Sequencer(blockchain)
+    sequencer.start()
+    producer = BlockProducer(blockchain, max_transactions=args.block_size, max_wait=0.2, sequencer=sequencer)
+    producer.start()
+
+    # Cada eleitor vota uma vez; uma fração tenta votar de novo a partir de outro thread
+    submissions = [v for v in range(args.voters)]
+    submissions += random.sample(range(args.voters), int(args.voters * args.duplicates))
+    random.shuffle(submissions)
+    accepted = []
+    rejected = []
+    read_errors = []
+    done = threading.Event()
+
+    def writer(chunk):
+        for voter in chunk:
+            transaction = signing.prepare(make_vote(voter, 3))
+            if sequencer.add_transaction(transaction):
+                accepted.append(transaction['cpf_hash'])
+            else:
+                rejected.append(transaction['cpf_hash'])
+            producer.notify()
+
+    def reader():
+        # Leituras sem trava concorrendo com a escrita
+        while not done.is_set():
+            try:
+                blockchain.has_voted(hashlib.sha256(b'00000000000').hexdigest())
+                blockchain.tally.to_dict()
+                blockchain.get_block(len(blockchain.chain) - 1)
+            except Exception as e:
+                read_errors.append(repr(e))
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=writer, args=(submissions[i::args.threads],)) for i in range(args.threads)]
+    readers = [threading.Thread(target=reader) for _ in range(args.readers)]
+    for t in threads + readers:
+        t.start()
+    for t in threads:
+        t.join()
+    submit_seconds = time.perf_counter() - start_time
+    producer.stop()
+    done.set()
+    for t in readers:
+        t.join()
+    sequencer.stop()
+    elapsed = time.perf_counter() - start_time
+
+    # Outro processo não pode abrir a mesma cadeia para escrita
+    result = multiprocessing.Value('i', -1)
+    process = multiprocessing.Process(target=_try_lock, args=(lock.path, result))
+    process.start()
+    process.join()
+
+    in_chain = [tx['cpf_hash'] for block in blockchain.iter_blocks() for tx in block.transactions]
+    blockchain.close()
+    reloaded = Blockchain(checkpoint_signer=signing)
+    audit = reloaded.audit(processes=1, public_keys={signing.name: public_key_pem(signing.algorithm)})
+    report = {
+        'submissions': len(submissions),
+        'voters': args.voters,
+        'accepted': len(accepted),
+        'rejected': len(rejected),
+        'votes_in_chain': len(in_chain),
+        'unique_in_chain': len(set(in_chain)),
+        'blocks': len(reloaded.chain),
+        'pending_after_drain': len(reloaded.unconfirmed_transactions),
+        'read_errors': len(read_errors),
+        'invalid_blocks': len(audit['invalid_blocks']),
+        'invalid_signatures': len(audit['invalid_signatures']),
+        'second_writer_refused': result.value == 0,
+        'submit_seconds': round(submit_seconds, 3),
+        'votes_per_second': round(len(submissions) / submit_seconds, 1),
+        'total_seconds': round(elapsed, 3),
+        'workdir': workdir
+    }
+    report['valid'] = (
+        report['accepted'] == args.voters
+        and report['rejected'] == len(submissions) - args.voters
+        and report['votes_in_chain'] == args.voters
+        and report['unique_in_chain'] == args.voters
+        and sorted(in_chain) == sorted(accepted)
+        and reloaded.tally.total == args.voters
+        and audit['valid']
+        and not report['pending_after_drain']
+        and not report['read_errors']
+        and report['second_writer_refused']
+    )
+    reloaded.close()
+    signing.close()
+    lock.release()
+    return report
+
+
+if __name__ == '__main__':
+    # Uso (a partir do diretório votacao): python -m bench.stress --threads 32 --voters 5000
+    parser = argparse.ArgumentParser(description='Teste de carga do sequenciador de escrita')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--voters', type=int, default=2000)
+    parser.add_argument('--duplicates', type=float, default=0.25, help='Fração de eleitores que tentam votar duas vezes')
+    parser.add_argument('--block-size', type=int, default=100)
+    parser.add_argument('--difficulty', type=int, default=1)
+    parser.add_argument('--algorithm', choices=sorted(ALGORITHMS), default=LEGACY_ALGORITHM)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    report = run(args)
+    print(json.dumps(report, indent=4))
+    sys.exit(0 if report['valid'] else 1)
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import time
+import logging
+from blockchain.block import Block
+from blockchain.chain import Blockchain
+from .stats import working_directory
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+# Início fixo dos timestamps, para que cadeias sintéticas do mesmo tamanho sejam comparáveis
+BASE_TIMESTAMP = 1700000000.0
+
+# Arquivo que descreve a cadeia já gerada em um diretório (permite reaproveitá-la entre execuções)
+META_FILE = 'synthetic.json'
+
+
+def cpf_for(voter):
+    return f'{voter:011d}'
+
+
+def synthetic_vote(voter, candidates=3):
+    return {
+        'type': 'vote',
+        'cpf_hash': hashlib.sha256(cpf_for(voter).encode()).hexdigest(),
+        'candidate_id': voter % candidates + 1,
+        'timestamp': BASE_TIMESTAMP + voter
+    }
+
+
+def build_chain(workdir, votes, block_size=1000):
+    # Gera em `workdir` uma cadeia com `votes` votos em blocos de `block_size` transações, minerados e
+    # adicionados pelo caminho normal (add_block), na dificuldade padrão da Blockchain
+    meta_path = os.path.join(workdir, META_FILE)
+    expected = {'votes': votes, 'block_size': block_size, 'difficulty': Blockchain.difficulty}
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if all(meta.get(key) == value for key, value in expected.items()):
+            logger.info(f"Reaproveitando cadeia sintética de {votes} votos em {workdir}")
+            return meta
+
+    os.makedirs(workdir, exist_ok=True)
+    with working_directory(workdir):
+        start_time = time.perf_counter()
+        blockchain = Blockchain()
+        for start in range(0, votes, block_size):
+            transactions = [synthetic_vote(voter) for voter in range(start, min(start + block_size, votes))]
+            last_block = blockchain.last_block
+            block = Block(last_block.index + 1, transactions, BASE_TIMESTAMP + start, last_block.hash)
+            blockchain.add_block(block, blockchain.proof_of_work(block))
+        blockchain.close()
+        meta = dict(expected, blocks=len(blockchain.chain), build_seconds=round(time.perf_counter() - start_time, 3))
+        with open(META_FILE, 'w') as f:
+            json.dump(meta, f)
+    logger.info(f"Cadeia sintética de {votes} votos gerada em {meta['build_seconds']}s")
+    return meta
@@ -0,0 +1,115 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from .block import Block
+from .signing import LEGACY_ALGORITHM, ALGORITHMS, load_verifier, verify_transaction
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+# Algoritmos (com as chaves públicas) usados pelos processos de auditoria para verificar assinaturas
+_verifiers = None
+
+
+def _init_worker(public_keys):
+    global _verifiers
+    _verifiers = {name: load_verifier(name, pem) for name, pem in public_keys.items()} if public_keys else None
+
+
+def verify_signature(transaction):
+    # Verifica a assinatura com a chave do algoritmo da transação (RSA-PSS nas transações antigas)
+    verifier = _verifiers.get(transaction.get('sig_alg', LEGACY_ALGORITHM))
+    return verifier is not None and verify_transaction(verifier, transaction)
+
+
+def audit_blocks(blocks, previous_hash, difficulty):
+    # Audita uma faixa contínua de blocos (dicionários). `previous_hash` é o hash do bloco anterior à
+    # faixa (None para a faixa que começa no gênesis).
+    report = {'blocks': 0, 'invalid_blocks': [], 'signatures': 0, 'invalid_signatures': []}
+    for block_data in blocks:
+        block = Block.from_dict(block_data)
+        report['blocks'] += 1
+        if block.compute_hash() != block.hash:
+            report['invalid_blocks'].append([block.index, 'hash'])
+        elif block.index > 0 and not block.hash.startswith('0' * difficulty):
+            report['invalid_blocks'].append([block.index, 'proof_of_work'])
+        elif previous_hash is not None and block.previous_hash != previous_hash:
+            report['invalid_blocks'].append([block.index, 'previous_hash'])
+        if _verifiers is not None:
+            for position, tx in enumerate(block.transactions):
+                report['signatures'] += 1
+                if not verify_signature(tx):
+                    report['invalid_signatures'].append([block.index, position])
+        previous_hash = block.hash
+    return report
+
+
+def _chunks(blocks, chunk_size):
+    # Agrupa os blocos em faixas, junto com o hash do último bloco da faixa anterior
+    chunk = []
+    previous_hash = None
+    for block_data in blocks:
+        chunk.append(block_data)
+        if len(chunk) == chunk_size:
+            yield chunk, previous_hash
+            previous_hash = chunk[-1]['hash']
+            chunk = []
+    if chunk:
+        yield chunk, previous_hash
+
+
+def audit_chain(blocks, difficulty, processes=None, public_keys=None, chunk_size=500):
+    # Auditoria completa: hash, prova de trabalho e encadeamento de cada bloco e, se chaves públicas
+    # forem informadas ({algoritmo: PEM}), as assinaturas das transações. As faixas são verificadas em paralelo.
+    processes = processes or os.cpu_count() or 1
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    report = {'blocks': 0, 'invalid_blocks': [], 'signatures': 0, 'invalid_signatures': []}
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(processes, mp_context=context, initializer=_init_worker,
+                             initargs=(public_keys,)) as executor:
+        in_flight = []
+        for chunk, previous_hash in _chunks(blocks, chunk_size):
+            in_flight.append(executor.submit(audit_blocks, chunk, previous_hash, difficulty))
+            # Limita as faixas em memória ao dobro da quantidade de processos
+            while len(in_flight) >= processes * 2:
+                _merge(report, in_flight.pop(0).result())
+        for future in in_flight:
+            _merge(report, future.result())
+    report['seconds'] = round(time.perf_counter() - start_time, 6)
+    report['valid'] = not report['invalid_blocks'] and not report['invalid_signatures']
+    return report
+
+
+def _merge(report, partial):
+    for key in ('blocks', 'signatures'):
+        report[key] += partial[key]
+    for key in ('invalid_blocks', 'invalid_signatures'):
+        report[key].extend(partial[key])
+
+
+if __name__ == '__main__':
+    # Uso: python -m blockchain.audit --data-dir chain_data --public-key signing_key.pub.pem
+    from .storage import SegmentedStorage
+
+    parser = argparse.ArgumentParser(description='Auditoria completa da blockchain')
+    parser.add_argument('--data-dir', default='chain_data')
+    parser.add_argument('--difficulty', type=int, default=2)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--public-key', action='append', default=[],
+                        help='[algoritmo=]arquivo PEM da chave pública para verificar assinaturas '
+                             f'(algoritmos: {", ".join(sorted(ALGORITHMS))}; padrão {LEGACY_ALGORITHM})')
+    args = parser.parse_args()
+
+    public_keys = {}
+    for value in args.public_key:
+        name, _, path = value.rpartition('=')
+        with open(path, 'rb') as f:
+            public_keys[name or LEGACY_ALGORITHM] = f.read()
+    storage = SegmentedStorage(args.data_dir)
+    print(json.dumps(audit_chain(storage.iter_blocks(), args.difficulty, args.processes, public_keys), indent=4))
@@ -1,20 +1,221 @@
 import hashlib
 import json
+import struct
+from .merkle import merkle_root
+
+# Versões do formato de bloco:
+# 0 - legado: hash SHA-256 do JSON dos atributos do bloco
+# 1 - cabeçalho binário de tamanho fixo com resumo das transações e nonce no final
+# 2 - como a versão 1, mas o resumo das transações é a raiz de Merkle (permite comprovantes de inclusão)
+LEGACY_VERSION = 0
+MERKLE_VERSION = 2
+BLOCK_VERSION = MERKLE_VERSION
+
+# Cabeçalho binário (big-endian): versão, índice, timestamp, hash anterior, resumo das transações
+HEADER_PREFIX = struct.Struct('>BQd32s32s')
+# Nonce, sempre nos últimos 8 bytes do cabeçalho
+NONCE = struct.Struct('>Q')
+
+
+# Serialização canônica de dados em JSON (chaves ordenadas, sem espaços)
+def canonical_json(data):
+    return json.dumps(data, sort_keys=True, separators=(',', ':')).encode()
+
+
+# Resumo SHA-256 da lista de transações de um bloco (formato da versão 1)
+def transactions_digest(transactions):
+    return hashlib.sha256(canonical_json(transactions)).digest()
+
+
+# Campos de um cabeçalho binário serializado
+def parse_header(header):
+    version, index, timestamp, previous_hash, digest = HEADER_PREFIX.unpack(header[:HEADER_PREFIX.size])
+    return {
+        'version': version,
+        'index': index,
+        'timestamp': timestamp,
+        'previous_hash': previous_hash.hex(),
+        'transactions_digest': digest,
+        'nonce': NONCE.unpack(header[HEADER_PREFIX.size:])[0]
+    }
+
+
+# Hash inicial de um bloco no formato legado (calculado no construtor, com nonce 0 e sem `hash`)
+def legacy_initial_hash(index, transactions, timestamp, previous_hash):
+    data = {
+        'index': index,
+        'transactions': transactions,
+        'timestamp': timestamp,
+        'previous_hash': previous_hash,
+        'nonce': 0
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+# Hash de um bloco no formato legado. O hash gravado inclui o hash inicial do bloco, pois o
+# atributo `hash` fazia parte do JSON durante a mineração.
+def legacy_block_hash(index, transactions, timestamp, previous_hash, nonce):
+    data = {
+        'index': index,
+        'transactions': transactions,
+        'timestamp': timestamp,
+        'previous_hash': previous_hash,
+        'nonce': nonce,
+        'hash': legacy_initial_hash(index, transactions, timestamp, previous_hash)
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
 
 # Define a classe Block, que representa um bloco na blockchain.
 class Block:
+    __slots__ = ('version', '_index', '_transactions', '_timestamp', '_previous_hash',
+                 'nonce', 'hash', '_prefix', '_merkle_root')
+
     # Construtor da classe Block. Recebe informações básicas para inicializar um bloco.
-    def __init__(self, index, transactions, timestamp, previous_hash):
-        self.index = index  # Posição do bloco na cadeia.
-        self.transactions = transactions  # Lista de transações contidas neste bloco.
-        self.timestamp = timestamp  # Data e hora da criação do bloco.
-        self.previous_hash = previous_hash  # Hash do bloco anterior da cadeia.
-        self.nonce = 0  # Número usado para o processo de mineração (proof of work).
+    def __init__(self, index, transactions, timestamp, previous_hash, nonce=0, version=BLOCK_VERSION):
+        self.version = version  # Formato usado para calcular o hash do bloco.
+        self._index = index  # Posição do bloco na cadeia.
+        self._transactions = transactions  # Lista de transações contidas neste bloco.
+        self._timestamp = timestamp  # Data e hora da criação do bloco.
+        self._previous_hash = previous_hash  # Hash do bloco anterior da cadeia.
+        self._prefix = None  # Cabeçalho serializado sem o nonce (cache).
+        self._merkle_root = None  # Raiz de Merkle das transações (cache).
+        self.nonce = nonce  # Número usado para o processo de mineração (proof of work).
         self.hash = self.compute_hash()  # Hash do bloco atual, calculado com base nos dados acima.
 
+    # Alterar qualquer campo do cabeçalho invalida a serialização em cache. Transações devem ser
+    # substituídas (não modificadas no lugar) ou seguidas de uma chamada a invalidate().
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, value):
+        self._index = value
+        self._prefix = None
+
+    @property
+    def transactions(self):
+        return self._transactions
+
+    @transactions.setter
+    def transactions(self, value):
+        self._transactions = value
+        self.invalidate()
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @timestamp.setter
+    def timestamp(self, value):
+        self._timestamp = value
+        self._prefix = None
+
+    @property
+    def previous_hash(self):
+        return self._previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self._previous_hash = value
+        self._prefix = None
+
+    def invalidate(self):
+        # Descarta a serialização em cache
+        self._prefix = None
+        self._merkle_root = None
+
+    @property
+    def merkle_root(self):
+        # Raiz de Merkle das transações, calculada uma única vez enquanto as transações não mudarem
+        if self._merkle_root is None:
+            self._merkle_root = merkle_root(self._transactions)
+        return self._merkle_root
+
+    def header_prefix(self):
+        # Cabeçalho binário sem o nonce, calculado uma única vez enquanto o bloco não mudar
+        if self._prefix is None:
+            self._prefix = HEADER_PREFIX.pack(
+                self.version,
+                self._index,
+                self._timestamp,
+                bytes.fromhex(self._previous_hash.rjust(64, '0')),  # O gênesis aponta para "0"
+                self.merkle_root if self.version >= MERKLE_VERSION else transactions_digest(self._transactions)
+            )
+        return self._prefix
+
+    def header(self):
+        # Cabeçalho binário completo do bloco
+        return self.header_prefix() + NONCE.pack(self.nonce)
+
     # Método que calcula o hash do bloco atual.
     def compute_hash(self):
-        # Converte os atributos do bloco em uma string JSON ordenada (para garantir consistência).
-        block_string = json.dumps(self.__dict__, sort_keys=True)
-        # Retorna o hash SHA-256 da string codificada.
-        return hashlib.sha256(block_string.encode()).hexdigest()
\ No newline at end of file
+        if self.version == LEGACY_VERSION:
+            return legacy_block_hash(self._index, self._transactions, self._timestamp,
+                                     self._previous_hash, self.nonce)
+        # Retorna o hash SHA-256 do cabeçalho binário.
+        return hashlib.sha256(self.header()).hexdigest()
+
+    # Divide a serialização do bloco em prefixo e sufixo ao redor do nonce, para que a mineração
+    # não precise serializar o bloco novamente a cada tentativa. Retorna também se o nonce é
+    # codificado em binário (formato atual) ou como texto decimal (formato legado).
+    def hash_template(self):
+        if self.version == LEGACY_VERSION:
+            marker = '__nonce__'
+            data = {
+                'index': self._index,
+                'transactions': self._transactions,
+                'timestamp': self._timestamp,
+                'previous_hash': self._previous_hash,
+                'hash': legacy_initial_hash(self._index, self._transactions, self._timestamp,
+                                            self._previous_hash),
+                'nonce': marker
+            }
+            block_string = json.dumps(data, sort_keys=True)
+            # As chaves são ordenadas, então o nonce do bloco aparece antes do conteúdo das transações
+            prefix, suffix = block_string.split(json.dumps(marker), 1)
+            return prefix.encode(), suffix.encode(), False
+        return self.header_prefix(), b'', True
+
+    def to_dict(self):
+        # Representação do bloco para armazenamento e exibição
+        data = {
+            'version': self.version,
+            'index': self._index,
+            'transactions': self._transactions,
+            'timestamp': self._timestamp,
+            'previous_hash': self._previous_hash,
+            'nonce': self.nonce,
+            'hash': self.hash
+        }
+        if self.version >= MERKLE_VERSION:
+            data['merkle_root'] = self.merkle_root.hex()  # Informativo: sempre recalculado das transações
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        # Reconstrói o bloco a partir do dicionário salvo (blocos sem versão são do formato legado)
+        block = cls.__new__(cls)
+        block.version = data.get('version', LEGACY_VERSION)
+        block._index = data['index']
+        block._transactions = data['transactions']
+        block._timestamp = data['timestamp']
+        block._previous_hash = data['previous_hash']
+        block._prefix = None
+        block._merkle_root = None
+        block.nonce = data['nonce']
+        block.hash = data['hash']
+        return block
+
+
+# Calcula o hash do bloco para um nonce a partir do modelo gerado por Block.hash_template()
+def hash_with_nonce(prefix, nonce, suffix, packed=True):
+    encoded_nonce = NONCE.pack(nonce) if packed else str(nonce).encode()
+    return hashlib.sha256(prefix + encoded_nonce + suffix).hexdigest()
+
+
+# Identificador de uma transação: hash do seu conteúdo canônico, sem a assinatura
+def transaction_id(transaction):
+    content = {key: value for key, value in transaction.items() if key != 'signature'}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
@@ -1,22 +1,73 @@
-import json
-import os
 import time
+import threading
 import logging
-from .block import Block
+from .block import Block, MERKLE_VERSION, transaction_id
+from .merkle import leaf_hash, merkle_proof
+from .storage import create_storage
+from .lazy import LazyChain
+from .checkpoint import CheckpointStore
+from .audit import audit_chain
+from .mining import SingleThreadEngine
+from .voter_index import VoterIndex
+from .tally import TallyProjection
+from .metrics import Counter, Histogram, exponential_buckets
 
 
 # Cria um logger para registrar mensagens no sistema de log
 logger = logging.getLogger(__name__)
 
+# Métricas da cadeia
+STORAGE_SECONDS = Histogram('blockchain_storage_seconds', 'Duração das operações de armazenamento em segundos',
+                            ['operation'])
+MEMPOOL_DEPTH = Histogram('blockchain_mempool_depth', 'Transações pendentes na pool a cada bloco montado',
+                          buckets=exponential_buckets(1, 4, 9))
+BLOCKS_ADDED = Counter('blockchain_blocks_added_total', 'Blocos adicionados à cadeia')
+TRANSACTIONS = Counter('blockchain_transactions_total', 'Transações recebidas, por resultado', ['result'])
+
+# Versão do formato do checkpoint (checkpoints de outras versões são descartados)
+CHECKPOINT_VERSION = 3
+
 # Define a classe Blockchain, que gerencia a cadeia de blocos
 class Blockchain:
     # Define a dificuldade da mineração: número de zeros iniciais exigidos no hash
     difficulty = 2
+    # Tamanho, em segundos, das janelas de tempo do detalhamento da apuração (None desativa)
+    tally_bucket_seconds = 3600
+    # Mecanismo de armazenamento padrão ('segmented' ou 'json')
+    storage_backend = 'segmented'
+    # Arquivo JSON legado (migrado para o armazenamento segmentado no primeiro carregamento)
+    data_file = 'blockchain_data.json'
+    # Diretório dos segmentos de blocos e do write-ahead log de transações pendentes
+    data_dir = 'chain_data'
+    # Checkpoint do estado derivado (apuração e índices), usado para acelerar a inicialização
+    checkpoint_file = 'checkpoint.json'
+    # Intervalo, em blocos, entre gravações do checkpoint
+    checkpoint_interval = 100
+    # Lê os blocos do armazenamento sob demanda, quando ele permite leitura direta
+    lazy_loading = True
+    # Quantidade de blocos mantidos em memória na leitura sob demanda
+    block_cache_size = 1024
 
-    def __init__(self):
+    def __init__(self, storage=None, mining_engine=None, checkpoint_signer=None, signer=None):
         logger.info("Inicializando Blockchain...")
+        self.storage = storage or self.create_default_storage()  # Onde a cadeia é persistida
+        self.mining_engine = mining_engine or SingleThreadEngine()  # Como a prova de trabalho é calculada
+        self.signer = signer  # Serviço que assina em lote as transações antes da mineração (opcional)
+        self.checkpoint = CheckpointStore(self.checkpoint_file, checkpoint_signer) if self.checkpoint_file else None
         self.unconfirmed_transactions = []  # Lista de transações ainda não incluídas na blockchain
         self.chain = []  # Lista que conterá todos os blocos da blockchain
+        self.lock = threading.RLock()  # Protege a pool de transações e o fim da cadeia
+        self.tx_index = {}  # transaction_id -> (índice do bloco, posição da transação no bloco)
+        self.tx_index_start = 0  # Blocos anteriores a este ainda não indexados em tx_index (ver locate_transaction)
+        self.tx_index_lock = threading.Lock()  # Uma única reconstrução de tx_index por vez
+        self.hash_index = {}  # hash do bloco -> índice do bloco
+        self.pending_ids = set()  # transaction_id das transações ainda não confirmadas
+        self.voter_index = VoterIndex()  # Índice de cpf_hash que já votaram
+        self.tally = TallyProjection(self.tally_bucket_seconds)  # Apuração mantida incrementalmente
+        self.block_listeners = []  # Funções chamadas com cada bloco adicionado (ex.: modelo de leitura)
+        self.checkpoint_thread = None  # Thread da gravação do checkpoint em andamento
+        self.checkpoint_lock = threading.Lock()  # Serializa as gravações do checkpoint
+        self.checkpoint_height = 0  # Altura do último checkpoint gravado
         self.load_chain()  # Tenta carregar blockchain de um arquivo
         if not self.chain:
             self.create_genesis_block()  # Cria o primeiro bloco (gênesis) se a blockchain estiver vazia
@@ -27,19 +78,53 @@ class Blockchain:
         logger.debug("Criando bloco genesis")
         genesis_block = Block(0, [], time.time(), "0")
         genesis_block.hash = genesis_block.compute_hash()
+        self.storage.append_block(genesis_block.to_dict())  # Persiste o bloco gênesis
         self.chain.append(genesis_block)
-        self.save_chain()  # Salva o estado da blockchain no arquivo
+        self.apply_block(genesis_block)
 
     def add_block(self, block, proof):
-        # Adiciona um bloco à cadeia se a prova (hash) for válida
-        if self.is_valid_proof(block, proof):
+        # Adiciona um bloco à cadeia se a prova (hash) for válida e ele apontar para o último bloco
+        with self.lock:
+            last_block = self.last_block
+            if last_block and (block.previous_hash != last_block.hash or block.index != last_block.index + 1):
+                logger.warning(f"Bloco #{block.index} não se encadeia ao bloco #{last_block.index}")
+                return False
+            if not self.is_valid_proof(block, proof):
+                logger.warning(f"Bloco inválido rejeitado: {block.hash[:10]}...")
+                return False
+            block.hash = proof  # O hash do bloco passa a ser o encontrado na mineração
+            with STORAGE_SECONDS.labels('append_block').time():
+                self.storage.append_block(block.to_dict())  # Grava apenas o novo bloco
             self.chain.append(block)
-            logger.info(f"Bloco #{block.index} adicionado | Hash: {block.hash[:10]}...")
-            logger.debug(f"Detalhes do bloco: {block.__dict__}")
-            self.save_chain()
+            self.apply_block(block)
+            self.notify_listeners(block)
+            BLOCKS_ADDED.inc()
+            if self.checkpoint and block.index % self.checkpoint_interval == 0:
+                self.save_checkpoint(background=True)
+            logger.info("Bloco #%d adicionado | Hash: %s...", block.index, block.hash[:10])
+            # Serializar o bloco é caro: só quando o nível DEBUG estiver ativo
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Detalhes do bloco: %s", block.to_dict())
             return True
-        logger.warning(f"Bloco inválido rejeitado: {block.hash[:10]}...")
-        return False
+
+    def apply_block(self, block):
+        # Atualiza o estado derivado (índices e apuração) com um bloco adicionado à cadeia
+        self.hash_index[block.hash] = block.index
+        for position, tx in enumerate(block.transactions):
+            self.tx_index[transaction_id(tx)] = (block.index, position)
+        self.voter_index.add_block(block)
+        self.tally.add_block(block)
+
+    def add_block_listener(self, listener):
+        self.block_listeners.append(listener)
+
+    def notify_listeners(self, block):
+        # Uma falha em um ouvinte não impede a adição do bloco
+        for listener in self.block_listeners:
+            try:
+                listener(block)
+            except Exception as e:
+                logger.error(f"Erro no ouvinte de blocos: {str(e)}", exc_info=True)
 
     def is_valid_proof(self, block, block_hash):
         # Verifica se o hash fornecido começa com os zeros exigidos e é igual ao hash computado do bloco
@@ -51,86 +136,318 @@ class Blockchain:
 
     def proof_of_work(self, block):
         # Realiza a mineração: encontra um nonce tal que o hash do bloco tenha os zeros necessários
-        logger.debug(f"Iniciando mineração do bloco #{block.index}")
-        block.nonce = 0
-        computed_hash = block.compute_hash()
-        attempts = 0
-
-        # Loop até encontrar um hash válido
-        while not computed_hash.startswith('0' * self.difficulty):
-            block.nonce += 1
-            computed_hash = block.compute_hash()
-            attempts += 1
-            if attempts % 1000 == 0:
-                logger.debug(f"Tentativa {attempts} | Nonce: {block.nonce} | Hash: {computed_hash[:10]}...")
-        
-        logger.info(f"Bloco #{block.index} minerado após {attempts} tentativas")
+        logger.debug("Iniciando mineração do bloco #%d", block.index)
+        computed_hash = self.mining_engine.mine(block, self.difficulty)
+        logger.info("Bloco #%d minerado após %d tentativas", block.index, self.mining_engine.stats.last_attempts)
         return computed_hash
 
+    def create_default_storage(self):
+        # Cria o mecanismo de armazenamento configurado na classe
+        if self.storage_backend == 'json':
+            return create_storage('json', path=self.data_file)
+        return create_storage(self.storage_backend, directory=self.data_dir, legacy_file=self.data_file)
+
     def save_chain(self):
-        # Salva a blockchain e transações pendentes em um arquivo JSON
+        # Regrava toda a blockchain e as transações pendentes no armazenamento (compactação/exportação)
         try:
-            data = {
-                'chain': [block.__dict__ for block in self.chain],  # Converte os blocos em dicionários
-                'pending_tx': self.unconfirmed_transactions
-            }
-            with open('blockchain_data.json', 'w') as f:
-                json.dump(data, f, indent=4)
-            logger.debug("Blockchain salva no arquivo")
+            with STORAGE_SECONDS.labels('save').time():
+                self.storage.save([block.to_dict() for block in self.chain], self.unconfirmed_transactions)
+            logger.debug("Blockchain salva no armazenamento")
         except Exception as e:
             logger.error(f"Erro ao salvar blockchain: {str(e)}", exc_info=True)
 
     def load_chain(self):
-        # Carrega blockchain e transações pendentes de um arquivo JSON, se ele existir
+        # Carrega blockchain e transações pendentes do armazenamento, se existirem
+        start_time = time.perf_counter()
         try:
-            if os.path.exists('blockchain_data.json'):
-                with open('blockchain_data.json', 'r') as f:
-                    data = json.load(f)
-                    self.chain = []
-                    for block_data in data['chain']:
-                        # Reconstrói o objeto Block a partir do dicionário salvo
-                        block = Block(
-                            index=block_data['index'],
-                            transactions=block_data['transactions'],
-                            timestamp=block_data['timestamp'],
-                            previous_hash=block_data['previous_hash']
-                        )
-                        block.nonce = block_data['nonce']
-                        block.hash = block_data['hash']
-                        self.chain.append(block)
-                    self.unconfirmed_transactions = data['pending_tx']
-                logger.info(f"Blockchain carregada do arquivo: {len(self.chain)} blocos")
+            if self.lazy_loading and self.storage.supports_random_access:
+                # Apenas o índice de posições é lido; os blocos são materializados sob demanda
+                self.storage.open()
+                self.chain = LazyChain(self.storage, self.block_cache_size)
+                self.unconfirmed_transactions = self.storage.load_pending()
+            else:
+                blocks, pending = self.storage.load()
+                # Reconstrói os objetos Block a partir dos dicionários salvos
+                self.chain = [Block.from_dict(block_data) for block_data in blocks]
+                self.unconfirmed_transactions = pending
+            self.pending_ids = {transaction_id(tx) for tx in self.unconfirmed_transactions}
+            logger.info(f"Blockchain carregada do armazenamento: {len(self.chain)} blocos")
         except Exception as e:
             logger.error(f"Erro ao carregar blockchain: {str(e)}", exc_info=True)
+        self.load_derived_state()
+        STORAGE_SECONDS.labels('load').observe(time.perf_counter() - start_time)
+
+    def iter_blocks(self, start=0):
+        # Percorre os blocos a partir de `start` (leitura sequencial quando a cadeia é sob demanda)
+        if isinstance(self.chain, LazyChain):
+            return self.chain.iter_from(start)
+        return iter(self.chain[start:])
+
+    def load_derived_state(self):
+        # Restaura apuração e índices do checkpoint e aplica apenas os blocos posteriores a ele;
+        # sem checkpoint válido, reconstrói tudo em uma única passagem pela cadeia
+        start = 0
+        state = self.checkpoint.load() if self.checkpoint else None
+        self.tx_index = {}
+        if state and self.restore_checkpoint(state):
+            start = state['height']
+            self.checkpoint_height = start
+        else:
+            self.hash_index = {}
+            self.voter_index.rebuild([], [])
+            self.tally.rebuild([])
+        for block in self.iter_blocks(start):
+            self.apply_block(block)
+        self.voter_index.reset_pending(self.unconfirmed_transactions)
+        logger.info(f"Estado derivado pronto: {len(self.voter_index)} votos, {len(self.chain) - start} blocos reaplicados")
+
+    def restore_checkpoint(self, state):
+        # Aceita o checkpoint apenas se o bloco de topo registrado ainda fizer parte da cadeia
+        height = state['height']
+        if height == 0 or height > len(self.chain) or self.chain[height - 1].hash != state['tip_hash']:
+            logger.warning("Checkpoint não corresponde à blockchain: estado será reconstruído")
+            return False
+        if state.get('version') != CHECKPOINT_VERSION:
+            logger.warning("Checkpoint de outra versão: estado será reconstruído")
+            return False
+        # O índice de transações não faz parte do checkpoint: os blocos anteriores a ele só são
+        # indexados na primeira consulta que precisar deles
+        self.tx_index_start = height
+        self.hash_index = dict(state['hash_index'])
+        self.voter_index.restore(state['voters'], height, state['tip_hash'])
+        self.tally.restore(state['tally'], height, state['tip_hash'])
+        logger.info(f"Checkpoint restaurado na altura {height}")
+        return True
+
+    def save_checkpoint(self, background=False):
+        # Grava o estado derivado atual, vinculado ao bloco de topo. Sob o lock apenas o estado é
+        # copiado; com background=True a serialização, a assinatura e a gravação ocorrem em outra
+        # thread, sem bloquear a thread escritora
+        with self.lock:
+            last_block = self.last_block
+            if last_block is None or not self.checkpoint:
+                return
+            state = {
+                'version': CHECKPOINT_VERSION,
+                'height': len(self.chain),
+                'tip_hash': last_block.hash,
+                'voters': self.voter_index.snapshot(),
+                'tally': self.tally.snapshot(),
+                'hash_index': dict(self.hash_index)
+            }
+        if not background:
+            self.write_checkpoint(state)
+            return
+        if self.checkpoint_thread and self.checkpoint_thread.is_alive():
+            # O checkpoint é apenas uma otimização: o próximo intervalo grava um estado mais recente
+            logger.info("Checkpoint anterior ainda em gravação: altura %d ignorada", state['height'])
+            return
+        self.checkpoint_thread = threading.Thread(target=self.write_checkpoint, args=(state,),
+                                                  name='checkpoint-writer', daemon=True)
+        self.checkpoint_thread.start()
+
+    def write_checkpoint(self, state):
+        with self.checkpoint_lock:
+            if state['height'] < self.checkpoint_height:
+                return  # Um checkpoint mais recente já foi gravado
+            with STORAGE_SECONDS.labels('checkpoint').time():
+                self.checkpoint.save(state)
+            self.checkpoint_height = state['height']
+
+    def audit(self, processes=None, public_keys=None):
+        # Auditoria completa da cadeia (hashes, prova de trabalho, encadeamento e assinaturas) em paralelo
+        blocks = (block.to_dict() for block in self.iter_blocks())
+        report = audit_chain(blocks, self.difficulty, processes, public_keys)
+        if report['valid']:
+            logger.info(f"Auditoria concluída: {report['blocks']} blocos válidos em {report['seconds']:.2f}s")
+        else:
+            logger.warning(f"Auditoria encontrou problemas: {len(report['invalid_blocks'])} blocos e "
+                           f"{len(report['invalid_signatures'])} assinaturas inválidas")
+        return report
+
+    def close(self):
+        # Grava o checkpoint e fecha o armazenamento (chamado ao encerrar a aplicação)
+        self.save_checkpoint()
+        if self.checkpoint_thread:
+            self.checkpoint_thread.join()
+        self.storage.close()
+
+    def has_voted(self, cpf_hash):
+        # Verifica em O(1) se o CPF já possui voto confirmado ou pendente
+        return self.voter_index.has_voted(cpf_hash)
+
+    def verify_tally(self):
+        # Recalcula a apuração a partir da cadeia e confere com a projeção mantida em memória
+        fresh = TallyProjection()
+        fresh.rebuild(self.chain)
+        valid = fresh.checksum() == self.tally.checksum()
+        if not valid:
+            logger.warning("Apuração em cache diverge da blockchain")
+        return valid
+
+    def get_block(self, ref):
+        # Busca um bloco pelo índice (número ou texto numérico) ou pelo hash; retorna None se não existir
+        # isascii: isdigit também aceita dígitos como '²', que int() não converte
+        if isinstance(ref, str) and not (ref.isascii() and ref.isdigit()):
+            index = self.hash_index.get(ref)
+            return self.chain[index] if index is not None else None
+        index = int(ref)
+        return self.chain[index] if 0 <= index < len(self.chain) else None
+
+    def inclusion_proof(self, ref):
+        # Comprovante de inclusão de uma transação, localizada pelo transaction_id ou pelo cpf_hash.
+        # Retorna None se a transação não estiver confirmada ou o bloco não tiver raiz de Merkle.
+        location = self.locate_transaction(ref)
+        if location is not None:
+            block = self.chain[location[0]]
+            position = location[1]
+        else:
+            block_index = self.voter_index.block_of(ref)
+            if block_index is None:
+                return None
+            block = self.chain[block_index]
+            position = next(i for i, tx in enumerate(block.transactions) if tx.get('cpf_hash') == ref)
+        if block.version < MERKLE_VERSION:
+            return None
+        transaction = block.transactions[position]
+        return {
+            'tx_id': transaction_id(transaction),
+            'transaction': transaction,
+            'block_index': block.index,
+            'block_hash': block.hash,
+            'header': block.header().hex(),
+            'merkle_root': block.merkle_root.hex(),
+            'position': position,
+            'leaf': leaf_hash(transaction).hex(),
+            'proof': merkle_proof(block.transactions, position)
+        }
+
+    def locate_transaction(self, tx_id):
+        # Posição (índice do bloco, posição no bloco) de uma transação confirmada, ou None
+        location = self.tx_index.get(tx_id)
+        if location is None and self.tx_index_start:
+            self.index_checkpointed_transactions()
+            location = self.tx_index.get(tx_id)
+        return location
+
+    def index_checkpointed_transactions(self):
+        # Indexa, em uma única passagem, as transações dos blocos cobertos pelo checkpoint
+        with self.tx_index_lock:
+            end = self.tx_index_start
+            if not end:
+                return
+            start_time = time.perf_counter()
+            older = {}
+            for block in self.iter_blocks():
+                if block.index >= end:
+                    break
+                for position, tx in enumerate(block.transactions):
+                    older[transaction_id(tx)] = (block.index, position)
+            # Entradas de blocos posteriores ao checkpoint prevalecem, como na reconstrução completa
+            for tx_id, location in older.items():
+                self.tx_index.setdefault(tx_id, location)
+            self.tx_index_start = 0
+            logger.info(f"Índice de transações completado: {end} blocos em {time.perf_counter() - start_time:.2f}s")
+
+    def transaction_status(self, tx_id):
+        # Informa se uma transação está confirmada (e em qual bloco), pendente ou é desconhecida
+        if tx_id in self.pending_ids:
+            return {'status': 'pending'}
+        location = self.locate_transaction(tx_id)
+        if location is not None:
+            return {'status': 'confirmed', 'block_index': location[0], 'position': location[1]}
+        return None
 
     def add_new_transaction(self, transaction):
-        # Adiciona uma nova transação à lista de pendentes e salva o estado da blockchain
+        # Adiciona uma nova transação à lista de pendentes e a registra no write-ahead log
+        return self.add_new_transactions([transaction])[0]
+
+    def add_new_transactions(self, transactions):
+        # Adiciona um lote de transações com uma única gravação no write-ahead log. Retorna, para cada
+        # transação, se ela foi aceita (votos duplicados, inclusive dentro do lote, são rejeitados).
         try:
-            self.unconfirmed_transactions.append(transaction)
-            self.save_chain()
-            logger.debug(f"Transação adicionada: {transaction['type']}")
+            with self.lock:
+                accepted = []
+                results = []
+                batch_voters = set()
+                rejected = 0
+                for transaction in transactions:
+                    if transaction.get('type') == 'vote':
+                        cpf_hash = transaction['cpf_hash']
+                        if self.has_voted(cpf_hash) or cpf_hash in batch_voters:
+                            logger.warning(f"Transação de voto duplicado rejeitada: {cpf_hash[:6]}...")
+                            results.append(False)
+                            rejected += 1
+                            continue
+                        batch_voters.add(cpf_hash)
+                    accepted.append(transaction)
+                    results.append(True)
+                if accepted:
+                    self.storage.append_pending_batch(accepted)  # Só entram na pool depois de gravadas
+                for transaction in accepted:
+                    self.unconfirmed_transactions.append(transaction)
+                    self.pending_ids.add(transaction_id(transaction))
+                    self.voter_index.add_pending(transaction)
+            TRANSACTIONS.labels('accepted').inc(len(accepted))
+            TRANSACTIONS.labels('rejected').inc(rejected)
+            logger.debug("%d transações adicionadas", len(accepted))
+            return results
         except Exception as e:
             logger.error(f"Erro ao adicionar transação: {str(e)}", exc_info=True)
+            return [False] * len(transactions)
+
+    def prepare_block(self, max_transactions=None):
+        # Monta o próximo bloco com um lote retirado do início da pool; retorna (bloco, lote) ou None
+        with self.lock:
+            if not self.unconfirmed_transactions:
+                logger.warning("Tentativa de mineração sem transações")
+                return None
+            MEMPOOL_DEPTH.observe(len(self.unconfirmed_transactions))
+            batch = self.unconfirmed_transactions[:max_transactions]
+            last_block = self.last_block
+            new_block = Block(
+                index=last_block.index + 1,
+                transactions=batch,
+                timestamp=time.time(),
+                previous_hash=last_block.hash
+            )
+        return new_block, batch
 
-    def mine(self):
+    def sign_block(self, block):
+        # Assinatura em lote das transações ainda não assinadas, fora do lock e do caminho da requisição.
+        # As assinaturas vão para cópias das transações: os dicionários da pool podem estar sendo lidos
+        # por outras threads (ex.: a requisição que calcula o comprovante). Deve ocorrer antes da
+        # prova de trabalho, pois altera a raiz de Merkle já calculada na montagem do bloco.
+        if not self.signer or all('signature' in tx for tx in block.transactions):
+            return
+        transactions = [tx if 'signature' in tx else dict(tx) for tx in block.transactions]
+        self.signer.sign_batch([tx for tx in transactions if 'signature' not in tx])
+        block.transactions = transactions  # Descarta o cabeçalho em cache
+
+    def commit_block(self, block, proof, batch):
+        # Adiciona o bloco minerado e retira o seu lote da pool de transações pendentes
+        with self.lock:
+            if not self.add_block(block, proof):
+                return False  # As transações permanecem na pool para a próxima tentativa
+            # Novas transações só são adicionadas ao fim da pool, então o lote ainda é o seu início
+            self.unconfirmed_transactions = self.unconfirmed_transactions[len(batch):]
+            self.pending_ids.difference_update(transaction_id(tx) for tx in batch)
+            self.storage.rewrite_pending(self.unconfirmed_transactions, len(self.chain))
+            self.voter_index.reset_pending(self.unconfirmed_transactions)
+        return block.index
+
+    def mine(self, max_transactions=None):
         # Executa o processo de mineração, criando e adicionando um novo bloco com as transações pendentes
-        if not self.unconfirmed_transactions:
-            logger.warning("Tentativa de mineração sem transações")
+        prepared = self.prepare_block(max_transactions)
+        if prepared is None:
             return False
+        new_block, batch = prepared
+        self.sign_block(new_block)
 
-        last_block = self.last_block
-        new_block = Block(
-            index=last_block.index + 1,
-            transactions=self.unconfirmed_transactions,
-            timestamp=time.time(),
-            previous_hash=last_block.hash
-        )
-
+        # A prova de trabalho roda fora do lock para não bloquear a entrada de novas transações
         logger.info(f"Iniciando mineração do bloco #{new_block.index} com {len(new_block.transactions)} transações")
         proof = self.proof_of_work(new_block)
-        self.add_block(new_block, proof)
-        self.unconfirmed_transactions = []  # Limpa as transações pendentes após mineração
-        return new_block.index
+        return self.commit_block(new_block, proof, batch)
 
     @property
     def last_block(self):
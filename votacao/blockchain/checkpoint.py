@@ -0,0 +1,76 @@
+import json
+import os
+import logging
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+# Checkpoint do estado derivado da cadeia (topo, apuração, índices), assinado para que não possa
+# ser adulterado entre reinicializações. O arquivo é um JSON por linha: a assinatura e, em seguida,
+# os campos do estado como pares [campo, valor]. Dicionários grandes são divididos em várias linhas,
+# de modo que nenhuma serialização isolada segura o GIL por muito tempo (o checkpoint é gravado em
+# segundo plano, ao lado da thread escritora). A assinatura cobre os próprios bytes gravados.
+class CheckpointStore:
+    # Entradas por linha dos dicionários grandes do estado
+    chunk_size = 5000
+
+    def __init__(self, path='checkpoint.json', signer=None):
+        self.path = path
+        self.signer = signer  # Objeto com sign/verify de bytes (ex.: SigningService); sem ele não há assinatura
+
+    def encode(self, state):
+        lines = []
+        for key, value in state.items():
+            if isinstance(value, dict) and len(value) > self.chunk_size:
+                items = list(value.items())
+                for start in range(0, len(items), self.chunk_size):
+                    lines.append(json.dumps([key, dict(items[start:start + self.chunk_size])],
+                                            separators=(',', ':')).encode())
+            else:
+                lines.append(json.dumps([key, value], separators=(',', ':')).encode())
+        return b'\n'.join(lines)
+
+    def decode(self, payload):
+        state = {}
+        for line in payload.splitlines():
+            key, value = json.loads(line)
+            if key in state and isinstance(value, dict):
+                state[key].update(value)  # Continuação de um dicionário dividido em várias linhas
+            else:
+                state[key] = value
+        return state
+
+    def save(self, state):
+        try:
+            payload = self.encode(state)
+            signature = self.signer.sign(payload).hex() if self.signer else None
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(json.dumps({'signature': signature}).encode() + b'\n')
+                f.write(payload)
+            os.replace(tmp_path, self.path)  # Troca atômica para não deixar checkpoint corrompido
+            logger.info(f"Checkpoint gravado na altura {state['height']}")
+        except Exception as e:
+            logger.error(f"Erro ao gravar checkpoint: {str(e)}", exc_info=True)
+
+    def load(self):
+        # Retorna o estado do checkpoint, ou None se ele não existir ou a assinatura for inválida
+        try:
+            if not os.path.exists(self.path):
+                return None
+            with open(self.path, 'rb') as f:
+                header = json.loads(f.readline())
+                payload = f.read()
+            if 'state' in header or not payload:
+                logger.warning("Checkpoint em formato anterior: estado será reconstruído")
+                return None
+            if self.signer:
+                signature = header.get('signature')
+                if not signature or not self.signer.verify(payload, bytes.fromhex(signature)):
+                    logger.warning("Assinatura do checkpoint inválida: estado será reconstruído")
+                    return None
+            return self.decode(payload)
+        except Exception as e:
+            logger.error(f"Erro ao carregar checkpoint: {str(e)}", exc_info=True)
+            return None
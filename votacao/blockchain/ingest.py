@@ -0,0 +1,300 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import logging
+from .metrics import Counter
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+# Métrica da importação em lote
+INGESTED = Counter('blockchain_ingested_ballots_total', 'Cédulas processadas na importação em lote', ['result'])
+
+HEX_HASH = re.compile(r'^[0-9a-f]{64}$')
+
+
+# Resultado de uma importação: contagens, motivos de rejeição e vazão
+class IngestReport:
+    def __init__(self, max_rejections=100):
+        self.read = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.reasons = {}
+        self.rejections = []  # Primeiras rejeições, para a resposta HTTP
+        self.max_rejections = max_rejections
+        self.start_time = time.perf_counter()
+        self.seconds = 0.0
+
+    def reject(self, line, reason):
+        self.rejected += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        if len(self.rejections) < self.max_rejections:
+            self.rejections.append({'line': line, 'reason': reason})
+
+    @property
+    def per_second(self):
+        return self.read / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {
+            'read': self.read,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'reasons': dict(sorted(self.reasons.items())),
+            'rejections': self.rejections,
+            'seconds': round(self.seconds, 3),
+            'per_second': round(self.per_second, 1)
+        }
+
+
+def cpf_hash_of(record):
+    # Hash do CPF da cédula: a partir do CPF (com ou sem pontuação) ou de um cpf_hash já calculado
+    if 'cpf' in record:
+        cpf = str(record['cpf']).replace('.', '').replace('-', '')
+        if len(cpf) != 11 or not cpf.isdigit():
+            return None
+        return hashlib.sha256(cpf.encode()).hexdigest()
+    cpf_hash = record.get('cpf_hash')
+    if isinstance(cpf_hash, str) and HEX_HASH.match(cpf_hash):
+        return cpf_hash
+    return None
+
+
+# Importação em lote de cédulas coletadas offline (um JSON por linha). A leitura e a validação são
+# geradores, de modo que apenas um lote (um bloco) de cédulas fica em memória por vez; cada lote passa,
+# em ordem, por: verificação das assinaturas das seções -> deduplicação -> assinatura -> gravação
+class BallotIngestor:
+    def __init__(self, blockchain, sequencer, signer, candidates, block_size=100, producer=None,
+                 station_verifier=None, rejection_log=None, progress_every=10000):
+        self.blockchain = blockchain
+        self.sequencer = sequencer  # Toda gravação passa pela thread escritora
+        self.signer = signer  # Serviço de assinatura da aplicação
+        self.candidates = set(candidates)
+        self.block_size = producer.max_transactions if producer else block_size
+        self.producer = producer  # Com produtor (servidor), a mineração fica a cargo dele
+        self.station_verifier = station_verifier  # Verifica cédulas já assinadas pela seção de votação
+        self.rejection_log = rejection_log  # Arquivo para o registro de todas as rejeições (JSON lines)
+        self.progress_every = progress_every
+        self.start_height = 0  # Altura da cadeia no início da importação
+        self.start_pending = set()  # CPFs com voto pendente no início da importação
+
+    def _reject(self, report, line, reason, record=None):
+        report.reject(line, reason)
+        INGESTED.labels('rejected').inc()
+        if self.rejection_log:
+            entry = {'line': line, 'reason': reason}
+            if record is not None:
+                entry['record'] = record
+            self.rejection_log.write(json.dumps(entry) + '\n')
+
+    def parse(self, lines, report):
+        # Etapa 1: decodifica cada linha não vazia
+        for line_number, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', errors='replace')
+            line = line.strip()
+            if not line:
+                continue
+            report.read += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                self._reject(report, line_number, 'json_invalido')
+                continue
+            if not isinstance(record, dict):
+                self._reject(report, line_number, 'json_invalido')
+                continue
+            yield line_number, record
+            if self.progress_every and report.read % self.progress_every == 0:
+                elapsed = time.perf_counter() - report.start_time
+                logger.info("Importação: %d cédulas lidas, %d aceitas, %d rejeitadas (%.0f/s)",
+                            report.read, report.accepted, report.rejected, report.read / elapsed)
+
+    def validate(self, records, report):
+        # Etapa 2: formato do CPF, candidato e timestamp; monta a transação de voto
+        for line_number, record in records:
+            cpf_hash = cpf_hash_of(record)
+            if cpf_hash is None:
+                self._reject(report, line_number, 'cpf_invalido')
+                continue
+            candidate_id = record.get('candidate_id')
+            if isinstance(candidate_id, bool) or candidate_id not in self.candidates:
+                self._reject(report, line_number, 'candidato_invalido', {'candidate_id': candidate_id})
+                continue
+            timestamp = record.get('timestamp', time.time())
+            if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)):
+                self._reject(report, line_number, 'timestamp_invalido')
+                continue
+            transaction = {
+                'type': 'vote',
+                'cpf_hash': cpf_hash,
+                'candidate_id': candidate_id,
+                'timestamp': timestamp
+            }
+            if 'station' in record:
+                transaction['station'] = str(record['station'])
+            if 'signature' in record:
+                # Cédula assinada na seção sobre esta mesma transação (com `sig_alg`): a assinatura é
+                # conferida antes de ser substituída pela da aplicação
+                transaction['sig_alg'] = record.get('sig_alg')
+                transaction['signature'] = record['signature']
+            yield line_number, transaction
+
+    def batches(self, transactions):
+        # Etapa 3: agrupa as transações em lotes do tamanho de um bloco
+        batch = []
+        for item in transactions:
+            batch.append(item)
+            if len(batch) >= self.block_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def verify_stations(self, batch, report):
+        # Etapa 4: confere as assinaturas das seções. Vem antes da deduplicação, para que uma cédula
+        # com assinatura inválida não impeça outra cédula, válida, do mesmo CPF.
+        signed = [item for item in batch if 'signature' in item[1]]
+        if not signed:
+            return batch
+        if self.station_verifier is None:
+            invalid = {line_number for line_number, _ in signed}
+        else:
+            results = self.station_verifier.verify_batch([transaction for _, transaction in signed])
+            invalid = {line_number for (line_number, _), valid in zip(signed, results) if not valid}
+        valid = []
+        for line_number, transaction in batch:
+            if line_number in invalid:
+                self._reject(report, line_number, 'assinatura_invalida')
+                continue
+            valid.append((line_number, transaction))
+        return valid
+
+    def duplicate_reason(self, cpf_hash):
+        # Motivo da rejeição de um CPF que já consta no índice de eleitores: voto anterior à
+        # importação ou cédula aceita antes, neste mesmo arquivo (lotes anteriores já foram gravados)
+        block_index = self.blockchain.voter_index.block_of(cpf_hash)
+        if cpf_hash in self.start_pending or (block_index is not None and block_index < self.start_height):
+            return 'ja_votou'
+        return 'duplicado_no_arquivo'
+
+    def deduplicate(self, batch, report):
+        # Etapa 5: descarta CPFs repetidos no lote e CPFs que já votaram (na cadeia ou na pool)
+        seen = set()
+        unique = []
+        for line_number, transaction in batch:
+            cpf_hash = transaction['cpf_hash']
+            if cpf_hash in seen:
+                self._reject(report, line_number, 'duplicado_no_arquivo')
+                continue
+            if self.blockchain.has_voted(cpf_hash):
+                self._reject(report, line_number, self.duplicate_reason(cpf_hash))
+                continue
+            seen.add(cpf_hash)
+            unique.append((line_number, transaction))
+        return unique
+
+    def sign(self, batch):
+        # Etapa 6: substitui a assinatura da seção pela da aplicação
+        for _, transaction in batch:
+            transaction.pop('signature', None)
+            transaction.pop('sig_alg', None)
+        self.signer.sign_batch([transaction for _, transaction in batch])
+        return batch
+
+    def commit(self, batch, report):
+        # Etapa 7: grava o lote na pool pela thread escritora e forma blocos completos
+        results = self.sequencer.submit(
+            self.blockchain.add_new_transactions, [transaction for _, transaction in batch]).result()
+        for (line_number, transaction), accepted in zip(batch, results):
+            if accepted:
+                report.accepted += 1
+                INGESTED.labels('accepted').inc()
+            else:
+                # Outro voto do mesmo CPF entrou na pool entre a deduplicação e a gravação
+                self._reject(report, line_number, self.duplicate_reason(transaction['cpf_hash']))
+        self._drain(self.block_size)
+
+    def _drain(self, threshold):
+        # Mantém a pool abaixo de `threshold` transações, limitando a memória usada pela importação
+        if self.producer:
+            self.producer.notify()
+            while len(self.blockchain.unconfirmed_transactions) >= threshold * 2 and self.producer.running:
+                time.sleep(0.05)
+            return
+        while len(self.blockchain.unconfirmed_transactions) >= threshold:
+            if self.sequencer.mine(self.block_size) is False:
+                break
+
+    def run(self, lines, max_rejections=100):
+        report = IngestReport(max_rejections)
+        with self.blockchain.lock:
+            self.start_height = len(self.blockchain.chain)
+            self.start_pending = {tx['cpf_hash'] for tx in self.blockchain.unconfirmed_transactions
+                                  if tx.get('type') == 'vote'}
+        for batch in self.batches(self.validate(self.parse(lines, report), report)):
+            batch = self.deduplicate(self.verify_stations(batch, report), report)
+            if batch:
+                self.commit(self.sign(batch), report)
+        if not self.producer:
+            self._drain(1)  # Sem servidor, o último bloco (incompleto) é minerado ao final
+        report.seconds = time.perf_counter() - report.start_time
+        logger.info("Importação concluída: %d cédulas lidas, %d aceitas, %d rejeitadas em %.2fs",
+                    report.read, report.accepted, report.rejected, report.seconds)
+        return report
+
+
+if __name__ == '__main__':
+    # Uso (a partir do diretório votacao, com o servidor parado):
+    # python -m blockchain.ingest cedulas.jsonl --rejections rejeitadas.jsonl
+    from .chain import Blockchain
+    from .sequencer import Sequencer, WriterLock
+    from .signing import (SigningService, LEGACY_ALGORITHM, default_key_path, load_or_create_key,
+                          load_verifier)
+
+    parser = argparse.ArgumentParser(description='Importação em lote de cédulas coletadas offline')
+    parser.add_argument('ballots', help="Arquivo JSON lines ('-' para a entrada padrão)")
+    parser.add_argument('--rejections', help='Arquivo JSON lines com cada cédula rejeitada e o motivo')
+    parser.add_argument('--block-size', type=int, default=100, help='Cédulas por bloco')
+    parser.add_argument('--candidates', default='1,2,3', help='IDs de candidatos válidos')
+    parser.add_argument('--station-key', help='algoritmo=arquivo PEM da chave pública das seções')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Threads de assinatura')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    algorithm = os.environ.get('SIGNING_ALGORITHM', LEGACY_ALGORITHM)
+    signing = SigningService(load_or_create_key(algorithm, os.environ.get('SIGNING_KEY_FILE', default_key_path(algorithm))),
+                             workers=args.workers)
+    station_verifier = None
+    if args.station_key:
+        name, _, path = args.station_key.rpartition('=')
+        with open(path, 'rb') as f:
+            station_verifier = SigningService(load_verifier(name or LEGACY_ALGORITHM, f.read()), workers=args.workers)
+
+    # Mesma trava do servidor: a importação offline não pode rodar com o servidor aberto
+    writer_lock = WriterLock(os.path.join(Blockchain.data_dir, 'writer.lock'))
+    writer_lock.acquire()
+    blockchain = Blockchain(checkpoint_signer=signing, signer=signing)
+    sequencer = Sequencer(blockchain)
+    sequencer.start()
+    rejection_log = open(args.rejections, 'w') if args.rejections else None
+    ballots = sys.stdin if args.ballots == '-' else open(args.ballots, 'r', encoding='utf-8')
+    try:
+        ingestor = BallotIngestor(
+            blockchain, sequencer, signing, [int(c) for c in args.candidates.split(',')],
+            block_size=args.block_size, station_verifier=station_verifier, rejection_log=rejection_log
+        )
+        report = ingestor.run(ballots)
+    finally:
+        ballots.close()
+        if rejection_log:
+            rejection_log.close()
+        sequencer.stop()
+        blockchain.close()
+        signing.close()
+        writer_lock.release()
+    print(json.dumps(report.to_dict(), indent=4))
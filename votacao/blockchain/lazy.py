@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+from .block import Block
+
+
+# Sequência de blocos lidos sob demanda do armazenamento, com cache dos blocos mais recentes.
+# Substitui a lista de blocos em memória quando o armazenamento permite leitura direta.
+class LazyChain:
+    def __init__(self, storage, cache_size=1024):
+        self.storage = storage
+        self.cache_size = cache_size  # Quantidade máxima de blocos mantidos em memória
+        self._length = storage.block_count()
+        self._cache = OrderedDict()  # índice -> Block, do menos para o mais recentemente usado
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self._length))]
+        if position < 0:
+            position += self._length
+        if position < 0 or position >= self._length:
+            raise IndexError('índice de bloco fora da cadeia')
+        with self._lock:
+            block = self._cache.get(position)
+            if block is not None:
+                self._cache.move_to_end(position)
+                return block
+        block = Block.from_dict(self.storage.read_block(position))
+        self._remember(position, block)
+        return block
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def iter_from(self, start):
+        # Percorre os blocos em ordem com leitura sequencial, sem ocupar o cache
+        length = self._length
+        for position, block_data in enumerate(self.storage.iter_blocks(start), start):
+            if position >= length:
+                break
+            with self._lock:
+                block = self._cache.get(position)
+            yield block if block is not None else Block.from_dict(block_data)
+
+    def append(self, block):
+        # Registra um bloco já gravado no armazenamento
+        self._remember(self._length, block)
+        self._length += 1
+
+    def _remember(self, position, block):
+        with self._lock:
+            self._cache[position] = block
+            self._cache.move_to_end(position)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import sys
+import time
+import tracemalloc
+import logging
+from .block import Block, LEGACY_VERSION, legacy_block_hash
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+# Classe Block original (hash do JSON de __dict__), mantida para verificação e comparação
+class LegacyBlock:
+    def __init__(self, index, transactions, timestamp, previous_hash):
+        self.index = index
+        self.transactions = transactions
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.nonce = 0
+        self.hash = self.compute_hash()
+
+    def compute_hash(self):
+        block_string = json.dumps(self.__dict__, sort_keys=True)
+        return hashlib.sha256(block_string.encode()).hexdigest()
+
+
+def verify_legacy_block(block_data, difficulty=0):
+    # Confere se um bloco gravado no formato legado corresponde ao hash armazenado
+    if block_data.get('version', LEGACY_VERSION) != LEGACY_VERSION:
+        return False
+    expected = legacy_block_hash(block_data['index'], block_data['transactions'], block_data['timestamp'],
+                                 block_data['previous_hash'], block_data['nonce'])
+    return expected == block_data['hash'] and expected.startswith('0' * difficulty)
+
+
+def verify_chain_hashes(blocks, difficulty=0):
+    # Verifica hash e encadeamento de uma lista de blocos (dicionários), em qualquer versão do formato.
+    # Retorna a lista de índices dos blocos inválidos.
+    invalid = []
+    previous_hash = None
+    for block_data in blocks:
+        block = Block.from_dict(block_data)
+        valid = block.compute_hash() == block.hash
+        if block.index > 0:
+            valid = valid and block.hash.startswith('0' * difficulty)
+        if previous_hash is not None and block.previous_hash != previous_hash:
+            valid = False
+        if not valid:
+            invalid.append(block.index)
+        previous_hash = block.hash
+    return invalid
+
+
+def _sample_transactions(count):
+    return [{
+        'type': 'vote',
+        'cpf_hash': hashlib.sha256(str(i).encode()).hexdigest(),
+        'candidate_id': i % 3 + 1,
+        'timestamp': 1745528218.9126794 + i,
+        'signature': 'ab' * 256
+    } for i in range(count)]
+
+
+def _measure_memory(factory, count):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    blocks = [factory(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return blocks, total / count
+
+
+def _measure_hashes(block, attempts):
+    start_time = time.perf_counter()
+    for nonce in range(attempts):
+        block.nonce = nonce
+        block.compute_hash()
+    return attempts / (time.perf_counter() - start_time)
+
+
+def compare_with_legacy(blocks=1000, transactions_per_block=10, attempts=2000):
+    # Compara memória por bloco (sem contar as transações, compartilhadas) e hashes por segundo
+    transactions = _sample_transactions(transactions_per_block)
+    results = {}
+    for name, cls in (('legacy', LegacyBlock), ('current', Block)):
+        created, bytes_per_block = _measure_memory(
+            lambda i: cls(i, transactions, 1745528218.9 + i, '0' * 64), blocks)
+        results[name] = {
+            'bytes_per_block': round(bytes_per_block, 1),
+            'shallow_size': sys.getsizeof(created[0]) + (
+                sys.getsizeof(created[0].__dict__) if hasattr(created[0], '__dict__') else 0),
+            'hashes_per_second': round(_measure_hashes(created[0], attempts), 1)
+        }
+    results['transactions_per_block'] = transactions_per_block
+    results['speedup'] = round(results['current']['hashes_per_second'] / results['legacy']['hashes_per_second'], 2)
+    return results
+
+
+if __name__ == '__main__':
+    # Uso: python -m blockchain.legacy [blocos] [transações por bloco]
+    args = [int(arg) for arg in sys.argv[1:3]]
+    print(json.dumps(compare_with_legacy(*args), indent=4))
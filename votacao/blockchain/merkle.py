@@ -0,0 +1,89 @@
+import hashlib
+import json
+import struct
+import sys
+
+
+# Prefixos distintos para folhas e nós internos, impedindo que um nó seja apresentado como folha
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def leaf_hash(transaction):
+    # Folha: hash do JSON canônico da transação (chaves ordenadas, sem espaços)
+    encoded = json.dumps(transaction, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.sha256(LEAF_PREFIX + encoded).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_levels(leaves):
+    # Constrói os níveis da árvore, das folhas até a raiz. Um nó sem par sobe sem alteração.
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parent = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parent.append(level[-1])
+        levels.append(parent)
+    return levels
+
+
+def merkle_root(transactions):
+    # Raiz de Merkle das transações (hash de bytes vazios para um bloco sem transações)
+    if not transactions:
+        return hashlib.sha256(b'').digest()
+    return build_levels([leaf_hash(tx) for tx in transactions])[-1][0]
+
+
+def merkle_proof(transactions, position):
+    # Caminho de irmãos da folha `position` até a raiz: lista de (lado do irmão, hash em hexadecimal)
+    levels = build_levels([leaf_hash(tx) for tx in transactions])
+    proof = []
+    for level in levels[:-1]:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append(['left' if sibling < position else 'right', level[sibling].hex()])
+        position //= 2
+    return proof
+
+
+def verify_proof(leaf, proof, root):
+    # Recalcula a raiz a partir da folha e do caminho de irmãos
+    computed = leaf
+    for side, sibling in proof:
+        sibling = bytes.fromhex(sibling)
+        computed = node_hash(sibling, computed) if side == 'left' else node_hash(computed, sibling)
+    return computed == root
+
+
+def verify_receipt(receipt, difficulty=0):
+    # Verifica um comprovante de inclusão sem acesso à cadeia: a transação leva, pelo caminho de
+    # irmãos, à raiz registrada no cabeçalho, e o cabeçalho tem o hash do bloco informado
+    from .block import MERKLE_VERSION, parse_header
+    try:
+        header = bytes.fromhex(receipt['header'])
+        fields = parse_header(header)
+        root = bytes.fromhex(receipt['merkle_root'])
+        return (
+            fields['version'] >= MERKLE_VERSION
+            and fields['transactions_digest'] == root
+            and fields['index'] == receipt['block_index']
+            and hashlib.sha256(header).hexdigest() == receipt['block_hash']
+            and receipt['block_hash'].startswith('0' * difficulty)
+            and verify_proof(leaf_hash(receipt['transaction']), receipt['proof'], root)
+        )
+    except (KeyError, ValueError, TypeError, struct.error):
+        return False
+
+
+if __name__ == '__main__':
+    # Uso: python -m blockchain.merkle comprovante.json [dificuldade]
+    with open(sys.argv[1], 'r') as f:
+        receipt = json.load(f)
+    difficulty = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    valid = verify_receipt(receipt, difficulty)
+    print('Comprovante válido' if valid else 'Comprovante inválido')
+    sys.exit(0 if valid else 1)
@@ -0,0 +1,211 @@
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import logging
+from .block import NONCE
+from .metrics import Histogram, exponential_buckets
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+# Métricas da prova de trabalho
+MINING_SECONDS = Histogram('blockchain_mining_seconds', 'Tempo de mineração de um bloco em segundos',
+                           buckets=exponential_buckets(0.001, 4, 9))
+MINING_ATTEMPTS = Histogram('blockchain_mining_attempts', 'Hashes calculados até encontrar o nonce de um bloco',
+                            buckets=exponential_buckets(16, 4, 10))
+
+# A cada quantas tentativas um processo verifica se a busca foi cancelada
+CANCEL_CHECK_INTERVAL = 4096
+
+# Identificador da busca em andamento, compartilhado com os processos do pool
+_current_job = None
+
+
+def _init_worker(current_job):
+    global _current_job
+    _current_job = current_job
+
+
+def search_range(prefix, suffix, difficulty, start, end, job_id=None, packed=True):
+    # Procura, no intervalo [start, end), um nonce cujo hash tenha os zeros iniciais exigidos.
+    # Retorna (nonce, hash, tentativas); nonce é None se não encontrou ou se a busca foi cancelada.
+    target = '0' * difficulty
+    base = hashlib.sha256(prefix)  # Estado do SHA-256 após o prefixo, reaproveitado a cada tentativa
+    encode_nonce = NONCE.pack if packed else (lambda value: str(value).encode())
+    attempts = 0
+    for nonce in range(start, end):
+        h = base.copy()
+        h.update(encode_nonce(nonce) + suffix)
+        computed_hash = h.hexdigest()
+        attempts += 1
+        if computed_hash.startswith(target):
+            return nonce, computed_hash, attempts
+        if job_id is not None and attempts % CANCEL_CHECK_INTERVAL == 0 and _current_job.value != job_id:
+            break  # Outro processo já encontrou o nonce
+    return None, None, attempts
+
+
+# Estatísticas de desempenho de um mecanismo de mineração
+class MiningStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.blocks = 0  # Blocos minerados
+        self.attempts = 0  # Total de hashes calculados
+        self.seconds = 0.0  # Tempo total gasto minerando
+        self.last_attempts = 0
+        self.last_seconds = 0.0
+
+    def record(self, attempts, seconds):
+        with self._lock:
+            self.blocks += 1
+            self.attempts += attempts
+            self.seconds += seconds
+            self.last_attempts = attempts
+            self.last_seconds = seconds
+
+    @property
+    def hashrate(self):
+        # Hashes por segundo, média desde o início
+        return self.attempts / self.seconds if self.seconds else 0.0
+
+    @property
+    def last_hashrate(self):
+        return self.last_attempts / self.last_seconds if self.last_seconds else 0.0
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'blocks': self.blocks,
+                'attempts': self.attempts,
+                'seconds': round(self.seconds, 6),
+                'hashrate': round(self.hashrate, 2),
+                'last_attempts': self.last_attempts,
+                'last_seconds': round(self.last_seconds, 6),
+                'last_hashrate': round(self.last_hashrate, 2)
+            }
+
+
+# Interface dos mecanismos de mineração (proof of work)
+class MiningEngine:
+    name = 'base'
+
+    def __init__(self):
+        self.stats = MiningStats()
+
+    def search(self, prefix, suffix, difficulty, packed=True):
+        # Retorna (nonce, hash, tentativas) para o modelo de bloco informado
+        raise NotImplementedError
+
+    def mine(self, block, difficulty):
+        # Encontra um nonce válido, grava-o no bloco e retorna o hash correspondente
+        prefix, suffix, packed = block.hash_template()
+        start_time = time.perf_counter()
+        nonce, computed_hash, attempts = self.search(prefix, suffix, difficulty, packed)
+        seconds = time.perf_counter() - start_time
+        self.stats.record(attempts, seconds)
+        MINING_SECONDS.observe(seconds)
+        MINING_ATTEMPTS.observe(attempts)
+        block.nonce = nonce
+        return computed_hash
+
+    def close(self):
+        pass
+
+    def to_dict(self):
+        data = {'engine': self.name}
+        data.update(self.stats.to_dict())
+        return data
+
+
+# Mineração sequencial na thread que a solicitou
+class SingleThreadEngine(MiningEngine):
+    name = 'single'
+
+    def search(self, prefix, suffix, difficulty, packed=True):
+        nonce, computed_hash, attempts = None, None, 0
+        start = 0
+        while nonce is None:
+            # Intervalos infinitos em partes, para reaproveitar a mesma função dos processos
+            nonce, computed_hash, chunk_attempts = search_range(
+                prefix, suffix, difficulty, start, start + CANCEL_CHECK_INTERVAL, packed=packed)
+            attempts += chunk_attempts
+            start += CANCEL_CHECK_INTERVAL
+        return nonce, computed_hash, attempts
+
+
+# Mineração paralela: divide o espaço de nonces em faixas distribuídas entre processos
+class MultiprocessEngine(MiningEngine):
+    name = 'multiprocess'
+
+    def __init__(self, processes=None, chunk_size=50000):
+        super().__init__()
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size  # Quantidade de nonces de cada faixa entregue a um processo
+        # O pool é criado aqui (com fork, quando disponível) para que os processos sejam
+        # iniciados antes das threads da aplicação
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        self._current_job = context.Value('q', 0)
+        self._pool = context.Pool(self.processes, initializer=_init_worker, initargs=(self._current_job,))
+        self._lock = threading.Lock()  # Uma busca por vez usa o pool
+        logger.info(f"Mineração paralela com {self.processes} processos")
+
+    def search(self, prefix, suffix, difficulty, packed=True):
+        with self._lock:
+            job_id = self._current_job.value
+            results = queue.Queue()
+            next_start = 0
+            in_flight = 0
+            attempts = 0
+
+            def submit():
+                nonlocal next_start, in_flight
+                self._pool.apply_async(
+                    search_range,
+                    (prefix, suffix, difficulty, next_start, next_start + self.chunk_size, job_id, packed),
+                    callback=results.put,
+                    error_callback=results.put
+                )
+                next_start += self.chunk_size
+                in_flight += 1
+
+            # Mantém duas faixas por processo em andamento para que nenhum fique ocioso
+            for _ in range(self.processes * 2):
+                submit()
+            try:
+                while True:
+                    result = results.get()
+                    in_flight -= 1
+                    if isinstance(result, Exception):
+                        raise result
+                    nonce, computed_hash, chunk_attempts = result
+                    attempts += chunk_attempts
+                    if nonce is not None:
+                        break
+                    submit()
+            finally:
+                # Cancela as faixas restantes: os processos percebem a troca do identificador da busca
+                with self._current_job.get_lock():
+                    self._current_job.value += 1
+            # Aguarda as faixas canceladas para contabilizar as tentativas e liberar o pool
+            while in_flight:
+                result = results.get()
+                in_flight -= 1
+                if not isinstance(result, Exception):
+                    attempts += result[2]
+            return nonce, computed_hash, attempts
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+
+
+def create_mining_engine(processes=1, **kwargs):
+    # Escolhe o mecanismo de mineração pela quantidade de processos desejada
+    if processes and processes > 1:
+        return MultiprocessEngine(processes, **kwargs)
+    return SingleThreadEngine()
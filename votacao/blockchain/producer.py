@@ -0,0 +1,81 @@
+import threading
+import time
+import logging
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+# Produtor de blocos em segundo plano: agrupa transações pendentes em blocos limitados por
+# quantidade máxima de transações e por tempo máximo de espera
+class BlockProducer:
+    def __init__(self, blockchain, max_transactions=100, max_wait=2.0, sequencer=None):
+        self.blockchain = blockchain
+        self.sequencer = sequencer  # Com sequenciador, os blocos são gravados pela thread escritora
+        self.max_transactions = max_transactions  # Máximo de transações por bloco
+        self.max_wait = max_wait  # Segundos máximos que uma transação espera por um bloco
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        # Inicia a thread produtora (idempotente)
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='block-producer', daemon=True)
+        self._thread.start()
+        logger.info(f"Produtor de blocos iniciado (até {self.max_transactions} transações ou {self.max_wait}s por bloco)")
+
+    def stop(self, drain=True):
+        # Encerra a thread; com drain=True minera as transações que ainda estiverem na pool
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if drain:
+            while self.blockchain.unconfirmed_transactions:
+                if self._mine() is False:
+                    break
+        logger.info("Produtor de blocos encerrado")
+
+    def notify(self):
+        # Avisa o produtor de que uma nova transação entrou na pool
+        with self._condition:
+            self._condition.notify_all()
+
+    def _mine(self):
+        if self.sequencer:
+            return self.sequencer.mine(self.max_transactions)
+        return self.blockchain.mine(self.max_transactions)
+
+    def _pending_count(self):
+        return len(self.blockchain.unconfirmed_transactions)
+
+    def _wait_for_batch(self):
+        # Espera até haver um lote cheio ou até o prazo da transação mais antiga vencer
+        with self._condition:
+            while self._running and not self._pending_count():
+                self._condition.wait()
+            deadline = time.monotonic() + self.max_wait
+            while self._running and self._pending_count() < self.max_transactions:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self._running
+
+    def _run(self):
+        while self._wait_for_batch():
+            try:
+                self._mine()
+            except Exception as e:
+                logger.error(f"Erro no produtor de blocos: {str(e)}", exc_info=True)
+                time.sleep(self.max_wait)  # Evita laço apertado em caso de falha persistente
@@ -0,0 +1,156 @@
+import os
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+
+try:
+    import fcntl  # Trava de arquivo em sistemas Unix
+except ImportError:
+    fcntl = None
+    import msvcrt  # Trava de arquivo no Windows
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+
+# Trava exclusiva no diretório de dados: impede que dois processos (ex.: vários workers do gunicorn)
+# abram a mesma cadeia e gravem versões independentes dela
+class WriterLock:
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        f = open(self.path, 'a+')
+        try:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            raise RuntimeError(f"A blockchain já está aberta por outro processo ({self.path}); "
+                               "execute um único processo servidor (use threads para concorrência)")
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        logger.info(f"Trava de escrita adquirida: {self.path}")
+
+    def release(self):
+        if self._file:
+            self._file.close()  # Fechar o arquivo libera a trava
+            self._file = None
+
+
+# Sequenciador de escrita: todas as alterações da cadeia passam por uma fila de comandos executada
+# por uma única thread escritora. As leituras continuam acessando a cadeia e os índices sem trava.
+class Sequencer:
+    # Máximo de comandos retirados da fila de uma vez (votos consecutivos são gravados juntos)
+    max_batch = 256
+
+    def __init__(self, blockchain, max_queue=10000):
+        self.blockchain = blockchain
+        self._queue = queue.Queue(max_queue)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='chain-writer', daemon=True)
+        self._thread.start()
+        logger.info("Sequenciador de escrita iniciado")
+
+    def stop(self):
+        # Executa os comandos já enfileirados e encerra a thread escritora
+        if not self._thread:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        logger.info("Sequenciador de escrita encerrado")
+
+    def submit(self, function, *args):
+        # Enfileira uma alteração qualquer; retorna um Future com o resultado
+        return self._put('call', (function, args))
+
+    def submit_transaction(self, transaction):
+        return self._put('add', transaction)
+
+    def add_transaction(self, transaction, timeout=None):
+        # Adiciona uma transação à pool pela thread escritora; retorna se ela foi aceita
+        return self.submit_transaction(transaction).result(timeout)
+
+    def mine(self, max_transactions=None):
+        # Monta e grava o bloco pela thread escritora; a assinatura e a prova de trabalho rodam na
+        # thread chamadora, sem bloquear a entrada de novas transações
+        prepared = self.submit(self.blockchain.prepare_block, max_transactions).result()
+        if prepared is None:
+            return False
+        block, batch = prepared
+        self.blockchain.sign_block(block)
+        logger.info(f"Iniciando mineração do bloco #{block.index} com {len(batch)} transações")
+        proof = self.blockchain.proof_of_work(block)
+        return self.submit(self.blockchain.commit_block, block, proof, batch).result()
+
+    def _put(self, kind, payload):
+        future = Future()
+        if not self._thread:
+            raise RuntimeError("Sequenciador de escrita não iniciado")
+        self._queue.put((kind, payload, future))
+        return future
+
+    def _drain(self):
+        # Bloqueia pelo primeiro comando e retira os demais já disponíveis, até max_batch
+        commands = [self._queue.get()]
+        while len(commands) < self.max_batch and commands[-1] is not None:
+            try:
+                commands.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return commands
+
+    def _run(self):
+        while True:
+            commands = self._drain()
+            stopping = commands[-1] is None
+            if stopping:
+                commands.pop()
+            # Votos consecutivos viram uma única gravação no write-ahead log; os demais comandos
+            # são executados um a um, na ordem de chegada
+            pending = []
+            for command in commands:
+                if command[0] == 'add':
+                    pending.append(command)
+                    continue
+                self._add_transactions(pending)
+                pending = []
+                self._call(*command[1:])
+            self._add_transactions(pending)
+            if stopping:
+                return
+
+    def _add_transactions(self, commands):
+        if not commands:
+            return
+        results = self.blockchain.add_new_transactions([transaction for _, transaction, _ in commands])
+        for (_, _, future), accepted in zip(commands, results):
+            future.set_result(accepted)
+
+    def _call(self, payload, future):
+        function, args = payload
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            logger.error(f"Erro no sequenciador de escrita: {str(e)}", exc_info=True)
+            future.set_exception(e)
@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, padding, rsa
+from .block import canonical_json
+from .metrics import Counter, Histogram
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+# Métricas da assinatura em lote
+SIGNING_SECONDS = Histogram('blockchain_signing_seconds', 'Duração da assinatura ou verificação de um lote em segundos',
+                            ['operation'])
+SIGNATURES = Counter('blockchain_signatures_total', 'Assinaturas calculadas ou verificadas', ['operation'])
+
+# Algoritmo das transações assinadas antes da introdução do campo `sig_alg`
+LEGACY_ALGORITHM = 'rsa-pss-sha256'
+
+
+def transaction_message(transaction):
+    # Bytes assinados de uma transação. Transações com `sig_alg` usam o JSON canônico (sem a
+    # assinatura); as antigas usam a representação em texto do dicionário, como eram assinadas.
+    content = {key: value for key, value in transaction.items() if key != 'signature'}
+    if 'sig_alg' in transaction:
+        return canonical_json(content)
+    return str(content).encode()
+
+
+def verify_transaction(algorithm, transaction):
+    # Verifica a assinatura de uma transação com o algoritmo indicado no seu campo `sig_alg`
+    try:
+        signature = bytes.fromhex(transaction['signature'])
+    except (KeyError, ValueError, TypeError):
+        return False
+    if transaction.get('sig_alg', LEGACY_ALGORITHM) != algorithm.name:
+        return False
+    return algorithm.verify(transaction_message(transaction), signature)
+
+
+# Assinatura RSA-PSS com SHA-256 (algoritmo original do sistema)
+class RsaPssAlgorithm:
+    name = 'rsa-pss-sha256'
+
+    def __init__(self, private_key=None, public_key=None):
+        self.private_key = private_key
+        self.public_key = public_key or private_key.public_key()
+
+    @staticmethod
+    def generate():
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def _padding(self):
+        return padding.PSS(
+            mgf=padding.MGF1(hashes.SHA256()),
+            salt_length=padding.PSS.MAX_LENGTH
+        )
+
+    def sign(self, data):
+        return self.private_key.sign(data, self._padding(), hashes.SHA256())
+
+    def verify(self, data, signature):
+        try:
+            self.public_key.verify(signature, data, self._padding(), hashes.SHA256())
+            return True
+        except InvalidSignature:
+            return False
+
+
+# Assinatura Ed25519: chaves e assinaturas menores e operações bem mais rápidas que RSA
+class Ed25519Algorithm:
+    name = 'ed25519'
+
+    def __init__(self, private_key=None, public_key=None):
+        self.private_key = private_key
+        self.public_key = public_key or private_key.public_key()
+
+    @staticmethod
+    def generate():
+        return ed25519.Ed25519PrivateKey.generate()
+
+    def sign(self, data):
+        return self.private_key.sign(data)
+
+    def verify(self, data, signature):
+        try:
+            self.public_key.verify(signature, data)
+            return True
+        except InvalidSignature:
+            return False
+
+
+# Algoritmos de assinatura disponíveis
+ALGORITHMS = {
+    RsaPssAlgorithm.name: RsaPssAlgorithm,
+    Ed25519Algorithm.name: Ed25519Algorithm
+}
+
+
+def public_key_pem(algorithm):
+    return algorithm.public_key.public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+def load_verifier(name, pem):
+    # Algoritmo apenas para verificação, a partir de uma chave pública em PEM
+    return ALGORITHMS[name](public_key=serialization.load_pem_public_key(pem))
+
+
+def default_key_path(name):
+    # Arquivo padrão da chave privada de cada algoritmo (o RSA mantém o nome original)
+    return 'signing_key.pem' if name == LEGACY_ALGORITHM else f'signing_key.{name}.pem'
+
+
+def public_key_path(path):
+    # Arquivo da chave pública ao lado da chave privada: chave.pem -> chave.pub.pem, chave -> chave.pub.pem
+    root, ext = os.path.splitext(path)
+    return root + '.pub' + (ext or '.pem')
+
+
+def load_or_create_key(name, path):
+    # Carrega a chave privada do algoritmo, gerando e gravando uma nova apenas na primeira execução
+    if name not in ALGORITHMS:
+        raise ValueError(f"Algoritmo de assinatura desconhecido: {name}")
+    cls = ALGORITHMS[name]
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return cls(serialization.load_pem_private_key(f.read(), password=None))
+
+    public_path = public_key_path(path)
+    if os.path.abspath(public_path) == os.path.abspath(path):
+        raise ValueError(f"Caminho da chave pública coincide com o da chave privada: {path}")
+    logger.info(f"Gerando nova chave de assinatura {name} em {path}")
+    algorithm = cls(cls.generate())
+    # Chave privada legível apenas pelo dono do processo
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(algorithm.private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ))
+    # Chave pública, para auditoria das assinaturas
+    with open(public_path, 'wb') as f:
+        f.write(public_key_pem(algorithm))
+    return algorithm
+
+
+# Serviço de assinatura: codificação canônica das transações e assinatura/verificação em lote em
+# um pool de threads (as operações do `cryptography` liberam o GIL)
+class SigningService:
+    def __init__(self, algorithm, workers=4):
+        self.algorithm = algorithm
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='signing')
+
+    @property
+    def name(self):
+        return self.algorithm.name
+
+    # Assinatura de bytes arbitrários (usada também pelo checkpoint)
+    def sign(self, data):
+        return self.algorithm.sign(data)
+
+    def verify(self, data, signature):
+        return self.algorithm.verify(data, signature)
+
+    def prepare(self, transaction):
+        # Marca a transação com o algoritmo; deve ser feito antes de calcular o transaction_id
+        transaction['sig_alg'] = self.algorithm.name
+        return transaction
+
+    def sign_transaction(self, transaction):
+        self.prepare(transaction)
+        transaction['signature'] = self.sign(transaction_message(transaction)).hex()
+        return transaction
+
+    def verify_transaction(self, transaction):
+        return verify_transaction(self.algorithm, transaction)
+
+    def sign_batch(self, transactions):
+        # Assina as transações em paralelo, gravando a assinatura em cada uma
+        with SIGNING_SECONDS.labels('sign').time():
+            for tx in transactions:
+                self.prepare(tx)
+            messages = [transaction_message(tx) for tx in transactions]
+            for tx, signature in zip(transactions, self._map(self.sign, messages)):
+                tx['signature'] = signature.hex()
+        SIGNATURES.labels('sign').inc(len(transactions))
+        return transactions
+
+    def verify_batch(self, transactions):
+        # Verifica as assinaturas em paralelo; retorna uma lista de booleanos na mesma ordem
+        with SIGNING_SECONDS.labels('verify').time():
+            results = self._map(self.verify_transaction, transactions)
+        SIGNATURES.labels('verify').inc(len(transactions))
+        return results
+
+    def _map(self, function, items):
+        # Executa no pool de threads; lotes unitários (ou após o encerramento do interpretador,
+        # quando o pool não aceita mais tarefas) são processados na própria thread
+        if self.workers > 1 and len(items) > 1:
+            try:
+                return list(self._executor.map(function, items))
+            except RuntimeError:
+                pass
+        return [function(item) for item in items]
+
+    def close(self):
+        self._executor.shutdown()
+
+
+def verify_chain_signatures(blocks, service, batch_size=1000):
+    # Verifica as assinaturas de todas as transações dos blocos em lotes, medindo a vazão
+    report = {'signatures': 0, 'invalid': [], 'seconds': 0.0}
+    start_time = time.perf_counter()
+    batch, locations = [], []
+
+    def flush():
+        for location, valid in zip(locations, service.verify_batch(batch)):
+            if not valid:
+                report['invalid'].append(location)
+        report['signatures'] += len(batch)
+        batch.clear()
+        locations.clear()
+
+    for block in blocks:
+        for position, tx in enumerate(block.transactions):
+            batch.append(tx)
+            locations.append([block.index, position])
+            if len(batch) >= batch_size:
+                flush()
+    flush()
+    report['seconds'] = round(time.perf_counter() - start_time, 6)
+    report['per_second'] = round(report['signatures'] / report['seconds'], 1) if report['seconds'] else 0.0
+    report['valid'] = not report['invalid']
+    return report
+
+
+if __name__ == '__main__':
+    # Uso: python -m blockchain.signing --data-dir chain_data --public-key signing_key.pub.pem
+    from .lazy import LazyChain
+    from .storage import SegmentedStorage
+
+    parser = argparse.ArgumentParser(description='Verificação em lote das assinaturas da blockchain')
+    parser.add_argument('--data-dir', default='chain_data')
+    parser.add_argument('--algorithm', default=LEGACY_ALGORITHM, choices=sorted(ALGORITHMS))
+    parser.add_argument('--public-key', required=True, help='Arquivo PEM da chave pública')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with open(args.public_key, 'rb') as f:
+        service = SigningService(load_verifier(args.algorithm, f.read()), args.workers)
+    chain = LazyChain(SegmentedStorage(args.data_dir))
+    print(json.dumps(verify_chain_signatures(chain, service), indent=4))
+    service.close()
@@ -0,0 +1,473 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+import logging
+from .block import transaction_id
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+# Cabeçalho de cada registro: tamanho do payload e CRC32 do payload (big-endian)
+RECORD_HEADER = struct.Struct('>II')
+
+
+def encode_record(data):
+    # Serializa um dicionário como registro com prefixo de tamanho e checksum
+    payload = json.dumps(data, separators=(',', ':')).encode()
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_records(path, offset=0):
+    # Lê os registros válidos de um arquivo a partir de `offset`, retornando
+    # ([(offset, registro), ...], offset do fim do último registro íntegro)
+    records = []
+    valid_end = offset
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break  # Fim do arquivo ou cabeçalho truncado
+            length, crc = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break  # Payload truncado ou corrompido (escrita interrompida)
+            try:
+                records.append((valid_end, json.loads(payload)))
+            except ValueError:
+                break
+            valid_end = f.tell()
+    return records, valid_end
+
+
+def read_record_at(f, offset):
+    # Lê um único registro na posição informada de um arquivo aberto em modo binário. Usa seek/read
+    # (os.pread não existe no Windows): o chamador deve garantir que o arquivo não é lido em paralelo.
+    f.seek(offset)
+    header = f.read(RECORD_HEADER.size)
+    if len(header) < RECORD_HEADER.size:
+        return None
+    length, crc = RECORD_HEADER.unpack(header)
+    payload = f.read(length)
+    if len(payload) < length or zlib.crc32(payload) != crc:
+        return None
+    return json.loads(payload)
+
+
+def truncate_torn_tail(path, valid_end):
+    # Remove do arquivo os bytes após o último registro íntegro (recuperação após falha)
+    size = os.path.getsize(path)
+    if size > valid_end:
+        logger.warning(f"Registro incompleto em {path}: truncando {size - valid_end} bytes")
+        with open(path, 'r+b') as f:
+            f.truncate(valid_end)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# Interface comum dos mecanismos de armazenamento da blockchain
+class StorageBackend:
+    # Indica se o mecanismo permite ler blocos individualmente, sem carregar a cadeia inteira
+    supports_random_access = False
+
+    def load(self):
+        # Retorna (lista de blocos como dicionários, lista de transações pendentes)
+        raise NotImplementedError
+
+    def append_block(self, block_data):
+        # Persiste um novo bloco no fim da cadeia
+        raise NotImplementedError
+
+    def append_pending(self, transaction):
+        # Persiste uma nova transação pendente
+        raise NotImplementedError
+
+    def append_pending_batch(self, transactions):
+        # Persiste várias transações pendentes de uma vez
+        for transaction in transactions:
+            self.append_pending(transaction)
+
+    def rewrite_pending(self, transactions, height):
+        # Substitui as transações pendentes após a inclusão de um bloco de altura `height`
+        raise NotImplementedError
+
+    def save(self, blocks, pending):
+        # Regrava todo o estado (cadeia e transações pendentes)
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+# Armazenamento legado: regrava toda a cadeia em um único arquivo JSON a cada alteração
+class JsonFileStorage(StorageBackend):
+    def __init__(self, path='blockchain_data.json'):
+        self.path = path
+        self.blocks = []
+        self.pending = []
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.blocks = data['chain']
+            self.pending = data['pending_tx']
+        return list(self.blocks), list(self.pending)
+
+    def append_block(self, block_data):
+        self.blocks.append(block_data)
+        self._write()
+
+    def append_pending(self, transaction):
+        self.pending.append(transaction)
+        self._write()
+
+    def append_pending_batch(self, transactions):
+        self.pending.extend(transactions)
+        self._write()
+
+    def rewrite_pending(self, transactions, height):
+        self.pending = list(transactions)
+        self._write()
+
+    def save(self, blocks, pending):
+        self.blocks = list(blocks)
+        self.pending = list(pending)
+        self._write()
+
+    def _write(self):
+        data = {
+            'chain': self.blocks,
+            'pending_tx': self.pending
+        }
+        with open(self.path, 'w') as f:
+            json.dump(data, f, indent=4)
+        logger.debug("Blockchain salva no arquivo")
+
+
+# Armazenamento append-only: blocos em segmentos rotativos, um índice de posições de tamanho fixo
+# para leitura direta de qualquer bloco e transações pendentes em um write-ahead log
+class SegmentedStorage(StorageBackend):
+    supports_random_access = True
+    segment_prefix = 'blocks-'
+    segment_suffix = '.seg'
+    wal_name = 'pending.wal'
+    index_name = 'blocks.idx'
+    # Entrada do índice: número do segmento e posição do registro do bloco
+    INDEX_ENTRY = struct.Struct('>IQ')
+
+    def __init__(self, directory='chain_data', max_segment_bytes=64 * 1024 * 1024,
+                 fsync_every=1, fsync_interval=None, legacy_file=None):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes  # Tamanho a partir do qual um novo segmento é aberto
+        self.fsync_every = fsync_every  # Registros entre fsyncs (0 deixa a sincronização a cargo do SO)
+        self.fsync_interval = fsync_interval  # Segundos máximos entre fsyncs (None desativa)
+        self.legacy_file = legacy_file  # Arquivo JSON antigo a ser migrado no primeiro carregamento
+        self.wal_path = os.path.join(directory, self.wal_name)
+        self.index_path = os.path.join(directory, self.index_name)
+        self._lock = threading.Lock()
+        self._opened = False
+        self._count = 0  # Quantidade de blocos gravados
+        self._segment = None  # Arquivo do segmento aberto para escrita
+        self._segment_number = 0
+        self._index = None  # Arquivo do índice de posições aberto para escrita
+        self._wal = None  # Arquivo do write-ahead log aberto para escrita
+        self._read_files = {}  # Arquivos de leitura por segmento
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+    def segment_path(self, number):
+        return os.path.join(self.directory, f"{self.segment_prefix}{number:06d}{self.segment_suffix}")
+
+    def segment_numbers(self):
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith(self.segment_prefix) and name.endswith(self.segment_suffix):
+                numbers.append(int(name[len(self.segment_prefix):-len(self.segment_suffix)]))
+        return sorted(numbers)
+
+    def open(self):
+        # Prepara o armazenamento: migração do JSON legado e recuperação do índice após falhas
+        with self._lock:
+            self._open()
+
+    def block_count(self):
+        with self._lock:
+            self._open()
+            return self._count
+
+    def read_block(self, position):
+        # Lê diretamente o bloco de índice `position` usando o índice de posições
+        with self._lock:
+            self._open()
+            if position < 0 or position >= self._count:
+                raise IndexError(position)
+            number, offset = self._read_index_entry(position)
+            # A posição do arquivo é compartilhada, então a leitura também ocorre sob o lock
+            block_data = read_record_at(self._read_file(number), offset)
+        if block_data is None:
+            raise IOError(f"Registro do bloco #{position} corrompido")
+        return block_data
+
+    def iter_blocks(self, start=0):
+        # Percorre sequencialmente os blocos a partir do índice `start`
+        with self._lock:
+            self._open()
+            count = self._count
+            if start >= count:
+                return
+            number, offset = self._read_index_entry(start)
+        position = start
+        for number in [n for n in self.segment_numbers() if n >= number]:
+            records, _ = read_records(self.segment_path(number), offset)
+            for _, block_data in records:
+                if position >= count:
+                    return
+                yield block_data
+                position += 1
+            offset = 0
+
+    def load_pending(self):
+        # Lê as transações pendentes do write-ahead log
+        with self._lock:
+            self._open()
+            if not os.path.exists(self.wal_path):
+                return []
+            records, valid_end = read_records(self.wal_path)
+            truncate_torn_tail(self.wal_path, valid_end)
+        pending = []
+        height = 0
+        for _, record in records:
+            if record['op'] == 'base':
+                height = record['height']
+            elif record['op'] == 'add':
+                pending.append(record['tx'])
+        # Descarta transações já incluídas em blocos gravados após a última compactação do log. A
+        # comparação usa o transaction_id, que não depende da assinatura feita na mineração.
+        confirmed = {transaction_id(tx)
+                     for block_data in self.iter_blocks(height) for tx in block_data['transactions']}
+        return [tx for tx in pending if transaction_id(tx) not in confirmed]
+
+    def load(self):
+        pending = self.load_pending()
+        blocks = list(self.iter_blocks())
+        logger.info(f"Armazenamento segmentado carregado: {len(blocks)} blocos, {len(pending)} pendentes")
+        return blocks, pending
+
+    def append_block(self, block_data):
+        with self._lock:
+            self._open()
+            record = encode_record(block_data)
+            segment = self._open_segment(len(record))
+            offset = segment.tell()
+            segment.write(record)
+            segment.flush()
+            self._index.write(self.INDEX_ENTRY.pack(self._segment_number, offset))
+            self._count += 1
+            self._after_write(self._index)
+
+    def append_pending(self, transaction):
+        with self._lock:
+            self._open()
+            wal = self._open_wal()
+            wal.write(encode_record({'op': 'add', 'tx': transaction}))
+            self._after_write(wal)
+
+    def append_pending_batch(self, transactions):
+        # Grava o lote inteiro com uma única escrita e um único fsync (group commit)
+        with self._lock:
+            self._open()
+            wal = self._open_wal()
+            wal.write(b''.join(encode_record({'op': 'add', 'tx': tx}) for tx in transactions))
+            self._after_write(wal)
+
+    def rewrite_pending(self, transactions, height):
+        # Compacta o log: grava em arquivo temporário e troca atomicamente
+        with self._lock:
+            self._open()
+            self._sync(force=True)
+            if self._wal:
+                self._wal.close()
+                self._wal = None
+            tmp_path = self.wal_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(encode_record({'op': 'base', 'height': height}))
+                for tx in transactions:
+                    f.write(encode_record({'op': 'add', 'tx': tx}))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.wal_path)
+
+    def save(self, blocks, pending):
+        # Regrava todos os segmentos a partir do estado informado
+        with self._lock:
+            self._open()
+            self._close_files()
+            for number in self.segment_numbers():
+                os.remove(self.segment_path(number))
+            open(self.index_path, 'wb').close()  # Índice vazio: evita repetir a migração do JSON legado
+            self._open()
+        for block_data in blocks:
+            self.append_block(block_data)
+        self.rewrite_pending(pending, len(blocks))
+
+    def flush(self):
+        with self._lock:
+            self._sync(force=True)
+
+    def close(self):
+        with self._lock:
+            self._close_files()
+
+    def _open(self):
+        if self._opened:
+            return
+        if (not self.segment_numbers() and not os.path.exists(self.index_path)
+                and self.legacy_file and os.path.exists(self.legacy_file)):
+            self._migrate_legacy()
+        self._recover_index()
+        self._index = open(self.index_path, 'ab')
+        self._opened = True
+
+    def _recover_index(self):
+        # Confere o fim do índice contra os segmentos: descarta entradas que apontam para dados
+        # perdidos, indexa registros gravados sem entrada e trunca um registro incompleto no final
+        numbers = self.segment_numbers()
+        size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        count = size // self.INDEX_ENTRY.size
+        resume = (numbers[0] if numbers else 0, 0)  # Ponto a partir do qual os segmentos são varridos
+        with open(self.index_path, 'a+b') as index_file:
+            while count:
+                index_file.seek((count - 1) * self.INDEX_ENTRY.size)
+                number, offset = self.INDEX_ENTRY.unpack(index_file.read(self.INDEX_ENTRY.size))
+                path = self.segment_path(number)
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        block_data = read_record_at(f, offset)
+                    if block_data is not None and block_data['index'] == count - 1:
+                        resume = (number, offset)
+                        break
+                count -= 1
+            recovered = []
+            for number in [n for n in numbers if n >= resume[0]]:
+                path = self.segment_path(number)
+                records, valid_end = read_records(path, resume[1] if number == resume[0] else 0)
+                if count and number == resume[0]:
+                    records = records[1:]  # O primeiro registro já está no índice
+                recovered.extend((number, offset) for offset, _ in records)
+                if number == numbers[-1]:
+                    truncate_torn_tail(path, valid_end)
+            index_file.truncate(count * self.INDEX_ENTRY.size)
+            index_file.seek(0, os.SEEK_END)
+            for number, offset in recovered:
+                index_file.write(self.INDEX_ENTRY.pack(number, offset))
+            if recovered or size != count * self.INDEX_ENTRY.size:
+                index_file.flush()
+                os.fsync(index_file.fileno())
+                logger.info(f"Índice de blocos recuperado: {len(recovered)} entradas reconstruídas")
+        self._count = count + len(recovered)
+
+    def _read_index_entry(self, position):
+        with open(self.index_path, 'rb') as f:
+            f.seek(position * self.INDEX_ENTRY.size)
+            return self.INDEX_ENTRY.unpack(f.read(self.INDEX_ENTRY.size))
+
+    def _read_file(self, number):
+        if number not in self._read_files:
+            self._read_files[number] = open(self.segment_path(number), 'rb')
+        return self._read_files[number]
+
+    def _migrate_legacy(self):
+        # Migração única do arquivo JSON legado para segmentos
+        with open(self.legacy_file, 'r') as f:
+            data = json.load(f)
+        path = self.segment_path(0)
+        with open(path, 'wb') as f:
+            for block_data in data['chain']:
+                f.write(encode_record(block_data))
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.wal_path, 'wb') as f:
+            f.write(encode_record({'op': 'base', 'height': len(data['chain'])}))
+            for tx in data['pending_tx']:
+                f.write(encode_record({'op': 'add', 'tx': tx}))
+            f.flush()
+            os.fsync(f.fileno())
+        logger.info(f"Migrados {len(data['chain'])} blocos de {self.legacy_file} para {self.directory}")
+
+    def _open_segment(self, record_size):
+        if self._segment is None:
+            numbers = self.segment_numbers()
+            self._segment_number = numbers[-1] if numbers else 0
+            self._segment = open(self.segment_path(self._segment_number), 'ab')
+        if self._segment.tell() > 0 and self._segment.tell() + record_size > self.max_segment_bytes:
+            # Rotaciona: sincroniza e fecha o segmento atual antes de abrir o próximo
+            self._sync(force=True)
+            self._segment.close()
+            self._segment_number += 1
+            self._segment = open(self.segment_path(self._segment_number), 'ab')
+            logger.info(f"Novo segmento de blocos: {self._segment_number:06d}")
+        return self._segment
+
+    def _open_wal(self):
+        if self._wal is None:
+            self._wal = open(self.wal_path, 'ab')
+        return self._wal
+
+    def _after_write(self, f):
+        f.flush()
+        self._unsynced += 1
+        self._sync()
+
+    def _sync(self, force=False):
+        # Agrupa fsyncs conforme a quantidade de registros e o tempo desde a última sincronização
+        if not self._unsynced:
+            return
+        due = force
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            due = True
+        if self.fsync_interval is not None and time.monotonic() - self._last_sync >= self.fsync_interval:
+            due = True
+        if not due:
+            return
+        # O segmento é sincronizado antes do índice, que nunca deve apontar para dados não gravados
+        for f in (self._segment, self._index, self._wal):
+            if f is not None:
+                os.fsync(f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _close_files(self):
+        self._sync(force=True)
+        for f in (self._segment, self._index, self._wal):
+            if f is not None:
+                f.close()
+        for f in self._read_files.values():
+            f.close()
+        self._segment = None
+        self._index = None
+        self._wal = None
+        self._read_files = {}
+        self._opened = False
+
+
+# Mecanismos de armazenamento disponíveis
+STORAGE_BACKENDS = {
+    'json': JsonFileStorage,
+    'segmented': SegmentedStorage
+}
+
+
+def create_storage(kind, **kwargs):
+    # Instancia o mecanismo de armazenamento pelo nome
+    if kind not in STORAGE_BACKENDS:
+        raise ValueError(f"Mecanismo de armazenamento desconhecido: {kind}")
+    return STORAGE_BACKENDS[kind](**kwargs)
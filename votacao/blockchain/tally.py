@@ -0,0 +1,86 @@
+import hashlib
+import json
+import logging
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+# Projeção da apuração: contadores por candidato mantidos incrementalmente a cada bloco adicionado
+class TallyProjection:
+    def __init__(self, bucket_seconds=None):
+        self.bucket_seconds = bucket_seconds  # Tamanho da janela de tempo do detalhamento (None desativa)
+        self.counts = {}  # candidate_id -> total de votos
+        self.buckets = {}  # início da janela (timestamp) -> {candidate_id: votos}
+        self.height = 0  # Quantidade de blocos já contabilizados
+        self.tip_hash = None  # Hash do último bloco contabilizado
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def add_block(self, block):
+        # Contabiliza os votos de um bloco recém adicionado
+        for tx in block.transactions:
+            if tx.get('type') != 'vote':
+                continue
+            candidate_id = tx['candidate_id']
+            self.counts[candidate_id] = self.counts.get(candidate_id, 0) + 1
+            if self.bucket_seconds:
+                bucket = int(tx['timestamp'] // self.bucket_seconds * self.bucket_seconds)
+                bucket_counts = self.buckets.setdefault(bucket, {})
+                bucket_counts[candidate_id] = bucket_counts.get(candidate_id, 0) + 1
+        self.height = block.index + 1
+        self.tip_hash = block.hash
+
+    def rebuild(self, chain):
+        # Recalcula a apuração do zero percorrendo toda a cadeia
+        self.counts = {}
+        self.buckets = {}
+        self.height = 0
+        self.tip_hash = None
+        for block in chain:
+            self.add_block(block)
+
+    def snapshot(self):
+        # Estado serializável da apuração (para o checkpoint)
+        return {
+            'counts': [[candidate_id, votes] for candidate_id, votes in self.counts.items()],
+            'buckets': [[bucket, [[candidate_id, votes] for candidate_id, votes in counts.items()]]
+                        for bucket, counts in self.buckets.items()]
+        }
+
+    def restore(self, data, height, tip_hash):
+        # Restaura a apuração a partir de um checkpoint
+        self.counts = {candidate_id: votes for candidate_id, votes in data['counts']}
+        self.buckets = {bucket: {candidate_id: votes for candidate_id, votes in counts}
+                        for bucket, counts in data['buckets']}
+        self.height = height
+        self.tip_hash = tip_hash
+
+    def votes_for(self, candidate_id):
+        return self.counts.get(candidate_id, 0)
+
+    def checksum(self):
+        # Hash da apuração vinculado ao bloco de topo, permitindo conferir o cache contra a cadeia
+        data = {
+            'height': self.height,
+            'tip_hash': self.tip_hash,
+            'counts': {str(candidate_id): votes for candidate_id, votes in self.counts.items()}
+        }
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+    def to_dict(self, include_buckets=False):
+        data = {
+            'height': self.height,
+            'tip_hash': self.tip_hash,
+            'counts': {str(candidate_id): votes for candidate_id, votes in sorted(self.counts.items())},
+            'checksum': self.checksum()
+        }
+        if include_buckets:
+            data['bucket_seconds'] = self.bucket_seconds
+            data['buckets'] = {
+                str(bucket): {str(candidate_id): votes for candidate_id, votes in sorted(counts.items())}
+                for bucket, counts in sorted(self.buckets.items())
+            }
+        return data
@@ -0,0 +1,64 @@
+import logging
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+# Índice de eleitores (cpf_hash) que já votaram, usado para checagem de voto duplicado em O(1)
+class VoterIndex:
+    def __init__(self):
+        self.confirmed = {}  # cpf_hash de votos já incluídos em blocos -> índice do bloco
+        self.pending = set()  # cpf_hash de votos ainda na pool de transações não confirmadas
+        self.height = 0  # Quantidade de blocos já indexados
+        self.tip_hash = None  # Hash do último bloco indexado
+
+    def __len__(self):
+        return len(self.confirmed) + len(self.pending)
+
+    def __contains__(self, cpf_hash):
+        return self.has_voted(cpf_hash)
+
+    def has_voted(self, cpf_hash):
+        # Um CPF é considerado como já votado se estiver em um bloco ou na pool pendente
+        return cpf_hash in self.confirmed or cpf_hash in self.pending
+
+    def add_block(self, block):
+        # Indexa os votos de um bloco recém adicionado e os remove da pool pendente
+        for tx in block.transactions:
+            if tx.get('type') == 'vote':
+                self.confirmed.setdefault(tx['cpf_hash'], block.index)
+                self.pending.discard(tx['cpf_hash'])
+        self.height = block.index + 1
+        self.tip_hash = block.hash
+
+    def block_of(self, cpf_hash):
+        # Índice do bloco que contém o voto confirmado do CPF, ou None
+        return self.confirmed.get(cpf_hash)
+
+    def add_pending(self, transaction):
+        # Registra um voto que entrou na pool de transações não confirmadas
+        if transaction.get('type') == 'vote':
+            self.pending.add(transaction['cpf_hash'])
+
+    def reset_pending(self, transactions):
+        # Reconstrói o conjunto pendente a partir da pool atual
+        self.pending = {tx['cpf_hash'] for tx in transactions if tx.get('type') == 'vote'}
+
+    def rebuild(self, chain, pending_transactions):
+        # Reconstrói o índice do zero percorrendo toda a cadeia
+        self.confirmed = {}
+        self.height = 0
+        self.tip_hash = None
+        for block in chain:
+            self.add_block(block)
+        self.reset_pending(pending_transactions)
+
+    def snapshot(self):
+        # Cópia dos votos confirmados (cpf_hash -> índice do bloco), serializável para o checkpoint
+        return dict(self.confirmed)
+
+    def restore(self, confirmed, height, tip_hash):
+        # Restaura o índice a partir de um checkpoint
+        self.confirmed = dict(confirmed)
+        self.height = height
+        self.tip_hash = tip_hash
@@ -0,0 +1,226 @@
+import hashlib
+import threading
+import time
+import logging
+from sqlalchemy import (MetaData, Table, Column, Integer, String, Float, create_engine, event, inspect,
+                        select, insert, delete, func)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import QueuePool
+from blockchain.block import transaction_id
+
+
+# Cria um logger para registrar mensagens no sistema de log
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+# Cadastro de eleitores aptos a votar (identificados apenas pelo hash do CPF)
+registered_voters = Table(
+    'registered_voters', metadata,
+    Column('cpf_hash', String(64), primary_key=True),
+    Column('name', String(100)),
+    Column('registered_at', Float)
+)
+
+# Modelo de leitura dos votos confirmados em blocos, alimentado a cada bloco adicionado. Cada linha
+# corresponde a uma posição da cadeia, de modo que a contagem confere com a apuração da blockchain.
+confirmed_votes = Table(
+    'confirmed_votes', metadata,
+    Column('block_index', Integer, primary_key=True),
+    Column('position', Integer, primary_key=True),
+    Column('tx_id', String(64), nullable=False, index=True),
+    Column('cpf_hash', String(64), nullable=False, index=True),
+    Column('candidate_id', Integer, nullable=False, index=True),
+    Column('timestamp', Float)
+)
+
+# Até qual bloco o modelo de leitura foi alimentado (chaves 'height' e 'tip_hash')
+read_model_state = Table(
+    'read_model_state', metadata,
+    Column('key', String(32), primary_key=True),
+    Column('value', String(64))
+)
+
+# Tabela de eleitores do esquema original (CPF em texto), importada para o cadastro na primeira execução
+legacy_voters = Table(
+    'voters', MetaData(),
+    Column('cpf', String(11), primary_key=True),
+    Column('name', String(100))
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL permite leituras concorrentes (inclusive de outros processos) enquanto um escritor grava
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+# Banco de dados do cadastro de eleitores e do modelo de leitura dos votos confirmados
+class VoterDatabase:
+    # Quantidade de votos gravados por transação durante a sincronização com a cadeia
+    sync_batch_size = 5000
+
+    def __init__(self, url='sqlite:///voting_system.db', pool_size=5, max_overflow=10):
+        kwargs = {}
+        if url.startswith('sqlite'):
+            # Conexões compartilhadas entre as threads do servidor; espera o lock de escrita por até 30s
+            kwargs['connect_args'] = {'check_same_thread': False, 'timeout': 30}
+        self.engine = create_engine(url, poolclass=QueuePool, pool_size=pool_size,
+                                    max_overflow=max_overflow, **kwargs)
+        if url.startswith('sqlite'):
+            event.listen(self.engine, 'connect', _set_sqlite_pragmas)
+        self.lock = threading.Lock()  # Serializa a alimentação do modelo de leitura
+        self.height = 0  # Quantidade de blocos já gravados no modelo de leitura
+        self.tip_hash = None  # Hash do último bloco gravado
+        self.blockchain = None
+        metadata.create_all(self.engine)
+        self.import_legacy_voters()
+        self.load_state()
+
+    def import_legacy_voters(self):
+        # Copia os eleitores da tabela original para o cadastro (apenas se o cadastro estiver vazio)
+        try:
+            if not inspect(self.engine).has_table('voters'):
+                return
+            with self.engine.begin() as conn:
+                if conn.execute(select(func.count()).select_from(registered_voters)).scalar():
+                    return
+                rows = [
+                    {'cpf_hash': hashlib.sha256(cpf.encode()).hexdigest(), 'name': name, 'registered_at': time.time()}
+                    for cpf, name in conn.execute(select(legacy_voters.c.cpf, legacy_voters.c.name))
+                ]
+                if rows:
+                    conn.execute(insert(registered_voters), rows)
+                    logger.info(f"{len(rows)} eleitores importados da tabela original")
+        except Exception as e:
+            logger.error(f"Erro ao importar eleitores: {str(e)}", exc_info=True)
+
+    def load_state(self):
+        with self.engine.connect() as conn:
+            state = dict(conn.execute(select(read_model_state.c.key, read_model_state.c.value)).fetchall())
+        self.height = int(state.get('height', 0))
+        self.tip_hash = state.get('tip_hash')
+
+    # CADASTRO DE ELEITORES
+
+    def register_voter(self, cpf_hash, name):
+        # Cadastra um eleitor; retorna False se o CPF já estiver cadastrado
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(registered_voters).values(
+                    cpf_hash=cpf_hash, name=name, registered_at=time.time()
+                ))
+            return True
+        except IntegrityError:
+            return False
+
+    def get_voter(self, cpf_hash):
+        # Dados do eleitor cadastrado, ou None
+        with self.engine.connect() as conn:
+            query = (select(registered_voters.c.cpf_hash, registered_voters.c.name, registered_voters.c.registered_at)
+                     .where(registered_voters.c.cpf_hash == cpf_hash))
+            row = conn.execute(query).first()
+        return {'cpf_hash': row[0], 'name': row[1], 'registered_at': row[2]} if row else None
+
+    def is_registered(self, cpf_hash):
+        return self.get_voter(cpf_hash) is not None
+
+    def voter_count(self):
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(registered_voters)).scalar()
+
+    # MODELO DE LEITURA DOS VOTOS CONFIRMADOS
+
+    def has_voted(self, cpf_hash):
+        with self.engine.connect() as conn:
+            query = select(confirmed_votes.c.block_index).where(confirmed_votes.c.cpf_hash == cpf_hash)
+            return conn.execute(query).first() is not None
+
+    def tally(self):
+        # Votos por candidato, agregados pelo índice de candidate_id
+        with self.engine.connect() as conn:
+            query = (select(confirmed_votes.c.candidate_id, func.count())
+                     .group_by(confirmed_votes.c.candidate_id)
+                     .order_by(confirmed_votes.c.candidate_id))
+            return {candidate_id: votes for candidate_id, votes in conn.execute(query)}
+
+    def to_dict(self):
+        return {
+            'height': self.height,
+            'tip_hash': self.tip_hash,
+            'counts': {str(candidate_id): votes for candidate_id, votes in self.tally().items()},
+            'registered_voters': self.voter_count()
+        }
+
+    def _vote_rows(self, block):
+        return [
+            {'block_index': block.index, 'position': position, 'tx_id': transaction_id(tx),
+             'cpf_hash': tx['cpf_hash'], 'candidate_id': tx['candidate_id'], 'timestamp': tx.get('timestamp')}
+            for position, tx in enumerate(block.transactions) if tx.get('type') == 'vote'
+        ]
+
+    def _write(self, rows, height, tip_hash, reset=False):
+        # Grava os votos e a nova altura na mesma transação; votos já gravados são ignorados
+        with self.engine.begin() as conn:
+            if reset:
+                conn.execute(delete(confirmed_votes))
+            if rows:
+                conn.execute(insert(confirmed_votes).prefix_with('OR IGNORE', dialect='sqlite'), rows)
+            conn.execute(delete(read_model_state))
+            conn.execute(insert(read_model_state), [
+                {'key': 'height', 'value': str(height)},
+                {'key': 'tip_hash', 'value': tip_hash}
+            ])
+        self.height = height
+        self.tip_hash = tip_hash
+
+    def add_block(self, block):
+        # Ouvinte de novos blocos da blockchain
+        try:
+            with self.lock:
+                if block.index < self.height:
+                    return
+                if block.index > self.height:
+                    # Blocos anteriores ainda não gravados (ex.: falha em uma gravação anterior)
+                    self._sync(self.blockchain)
+                    return
+                self._write(self._vote_rows(block), block.index + 1, block.hash)
+        except Exception as e:
+            logger.error(f"Erro ao gravar o bloco #{block.index} no modelo de leitura: {str(e)}", exc_info=True)
+
+    def sync(self, blockchain):
+        # Alimenta o modelo de leitura com os blocos ainda não gravados (ou o recria se divergir da cadeia)
+        with self.lock:
+            self._sync(blockchain)
+
+    def _sync(self, blockchain):
+        height = self.height
+        reset = False
+        if height > len(blockchain.chain) or (height and blockchain.chain[height - 1].hash != self.tip_hash):
+            logger.warning("Modelo de leitura diverge da cadeia: será reconstruído")
+            height, reset = 0, True
+        rows = []
+        tip_hash = self.tip_hash
+        start_time = time.perf_counter()
+        for block in blockchain.iter_blocks(height):
+            rows.extend(self._vote_rows(block))
+            height, tip_hash = block.index + 1, block.hash
+            if len(rows) >= self.sync_batch_size:
+                self._write(rows, height, tip_hash, reset)
+                rows, reset = [], False
+        if reset or height != self.height:
+            self._write(rows, height, tip_hash, reset)
+            logger.info(f"Modelo de leitura sincronizado até a altura {height} "
+                        f"em {time.perf_counter() - start_time:.2f}s")
+
+    def attach(self, blockchain):
+        # Sincroniza com a cadeia e passa a receber cada novo bloco adicionado
+        self.blockchain = blockchain
+        self.sync(blockchain)
+        blockchain.add_block_listener(self.add_block)
+
+    def close(self):
+        self.engine.dispose()